@@ -0,0 +1,407 @@
+"""
+Benchmarks for the Wagmi Hub bot.
+
+Usage:
+    python benchmark.py decode [--number N] [--repeat R]
+    python benchmark.py load [--accounts N] [--threads N] [--latency MS] ...
+    python benchmark.py replay CASSETTE [--latency-scale S] [--profile FILE]
+
+decode
+    Microbenchmark of wagmihub.decode_response over payloads shaped like the
+    real API responses (gamedata, task list, claim, initdata). Prints the best
+    time per call for each payload so regressions are easy to spot.
+
+load
+    End-to-end run of main() against mock_server.py on this machine. Starts
+    the mock, writes a config.json and a query.txt with N synthetic accounts
+    to a temporary directory, runs every account through the worker pipeline
+    once ("max_cycles": 1) and reports accounts/second, p50/p99 cycle time,
+    peak RSS (not on Windows) and API requests per account.
+
+replay
+    Runs main() from the current directory (its config.json and query.txt)
+    with every API call answered from a cassette recorded by
+    "python main.py --record CASSETTE". No network is used and, with
+    --latency-scale 0, the run measures only the client side: decoding,
+    logging and scheduling. Prints the wall time and the hottest functions
+    under cProfile.
+"""
+
+import argparse
+import asyncio
+import cProfile
+import json
+import os
+import pstats
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+import urllib.parse
+import urllib.request
+
+from multidict import CIMultiDict
+
+try:
+    # Hanya ada di Unix; di Windows peak RSS tidak dilaporkan
+    import resource
+except ImportError:
+    resource = None
+
+import main
+
+
+def gamedata_payload() -> dict:
+    """A game/mining/gamedata response with every field the bot reads."""
+    return {
+        "message": {
+            "miningData": {
+                "lastClaimTime": 1742198400,
+                "miningRate": 12.5,
+                "crackTime": 1742227200,
+                "level": 7,
+                "storage": 14400,
+            },
+            "userData": {
+                "balance": "1587000",
+                "allPoints": "2049000",
+                "tokens": "0",
+                "country": "ID",
+                "createdAt": "2025-01-12T08:21:44.000Z",
+                "telegramId": 1234567890,
+                "username": "wagmi_farmer",
+                "isPremium": False,
+            },
+            "squadData": {
+                "uuid": "7d2b6c1e-54b1-4e0e-9f1e-3f4b7f8a9c10",
+                "title": "LIVEXORDS",
+                "username": "livexordsscript",
+                "logoUrl": "https://cdn.cyberfin.xyz/squads/livexords.png",
+                "telegramChatId": "-1001234567890",
+            },
+            "dailyRewardsData": {
+                "currentDay": 4,
+                "isClaimed": False,
+                "isShowDailyReward": True,
+            },
+            "dailyRewardSchema": [
+                {"day": day, "reward": 1000 * day} for day in range(1, 31)
+            ],
+            "ticketCount": 5,
+            "boostData": [
+                {"id": i, "type": "mining", "level": i % 5, "price": 5000 * i}
+                for i in range(1, 13)
+            ],
+        }
+    }
+
+
+def tasks_payload() -> dict:
+    """A gametask/all response with a realistic number of tasks."""
+    return {
+        "message": [
+            {
+                "uuid": f"2f0c9a4e-8d3b-4c1a-9e7f-{i:012d}",
+                "title": f"Join channel #{i}",
+                "description": "Subscribe to the partner channel and stay there.",
+                "reward": 25000,
+                "link": f"https://t.me/partner_{i}",
+                "type": "TELEGRAM",
+                "isActive": i % 7 != 0,
+                "isCompleted": i % 3 == 0,
+            }
+            for i in range(40)
+        ]
+    }
+
+
+def claim_payload() -> dict:
+    """A mining/claim response."""
+    message = gamedata_payload()["message"]
+    return {
+        "message": {
+            "miningData": message["miningData"],
+            "userData": message["userData"],
+        }
+    }
+
+
+def initdata_payload() -> dict:
+    """A game/initdata response."""
+    return {"message": {"accessToken": "eyJhbGciOiJIUzI1NiJ9." + "a" * 180 + ".sig"}}
+
+
+class FakeResponse:
+    """The attributes of ApiResponse that decode_response reads."""
+
+    __slots__ = ("headers", "content")
+
+    def __init__(self, payload: dict, content_type: str):
+        self.headers = CIMultiDict(
+            {"Content-Type": content_type, "Content-Encoding": "gzip"}
+        )
+        self.content = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+
+
+def build_responses() -> dict:
+    json_type = "application/json; charset=utf-8"
+    return {
+        "gamedata": FakeResponse(gamedata_payload(), json_type),
+        "gametask/all": FakeResponse(tasks_payload(), json_type),
+        "mining/claim": FakeResponse(claim_payload(), json_type),
+        "game/initdata": FakeResponse(initdata_payload(), json_type),
+        "gamedata (text/plain)": FakeResponse(gamedata_payload(), "text/plain"),
+    }
+
+
+def bench_decode(args) -> None:
+    backend = "json" if main.json_loads is json.loads else "orjson"
+    print(f"decode_response microbenchmark (JSON backend: {backend})")
+    print(f"{'payload':<24}{'bytes':>8}{'best µs/op':>14}{'ops/s':>12}")
+    for name, response in build_responses().items():
+        timings = timeit.repeat(
+            lambda: main.wagmihub.decode_response(response),
+            number=args.number,
+            repeat=args.repeat,
+        )
+        best = min(timings) / args.number
+        print(
+            f"{name:<24}{len(response.content):>8}{best * 1e6:>14.2f}{1 / best:>12.0f}"
+        )
+
+
+def synthetic_query(n: int) -> str:
+    """Telegram initData for synthetic account n."""
+    user = json.dumps(
+        {"id": 7000000000 + n, "first_name": f"bench{n}", "username": f"bench{n}"},
+        separators=(",", ":"),
+    )
+    return urllib.parse.urlencode(
+        {
+            "query_id": f"AAH{n:010d}",
+            "user": user,
+            "auth_date": "1742198400",
+            "hash": f"{n:064x}",
+        }
+    )
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_mock(args, port: int) -> subprocess.Popen:
+    """Starts mock_server.py and waits until it answers."""
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "mock_server.py")
+    command = [
+        sys.executable,
+        script,
+        "--port",
+        str(port),
+        "--latency",
+        str(args.latency),
+        "--jitter",
+        str(args.jitter),
+        "--error-rate",
+        str(args.error_rate),
+        "--error-status",
+        str(args.error_status),
+        "--tasks",
+        str(args.tasks),
+        "--tickets",
+        str(args.tickets),
+        "--dead-rate",
+        str(args.dead_rate),
+    ]
+    mock = subprocess.Popen(command)
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/stats", timeout=1)
+            return mock
+        except OSError:
+            time.sleep(0.1)
+    mock.terminate()
+    raise RuntimeError("mock_server.py did not start")
+
+
+def percentile(samples: list, pct: float) -> float:
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def bench_load(args) -> None:
+    port = args.port or free_port()
+    phases = set(args.phases.split(","))
+    cycle_times = []
+
+    # Ukur waktu per akun langsung di pipeline worker
+    process_account = main.process_account
+
+    async def timed_process_account(ctx, wagmi, config):
+        start = time.perf_counter()
+        try:
+            await process_account(ctx, wagmi, config)
+        finally:
+            cycle_times.append(time.perf_counter() - start)
+
+    main.process_account = timed_process_account
+
+    mock = start_mock(args, port)
+    cwd = os.getcwd()
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            config = {
+                "base_url": f"http://127.0.0.1:{port}/api/v1/",
+                "thread": args.threads,
+                "concurrency": False if args.static else {"max": args.max_threads},
+                "max_cycles": 1,
+                "delay_account_switch": 0,
+                "proxy": False,
+                "log_level": args.log_level,
+                "rate_limit": {"global": args.rate_limit},
+                "token_cache": os.path.join(workdir, "tokens.json"),
+                **{
+                    phase: phase in phases
+                    for phase in ("daily", "task", "farming", "game")
+                },
+            }
+            with open(os.path.join(workdir, "config.json"), "w") as file:
+                json.dump(config, file)
+            with open(os.path.join(workdir, "query.txt"), "w") as file:
+                file.writelines(synthetic_query(n) + "\n" for n in range(args.accounts))
+
+            os.chdir(workdir)
+            start = time.perf_counter()
+            asyncio.run(main.main())
+            elapsed = time.perf_counter() - start
+    finally:
+        os.chdir(cwd)
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/stats") as response:
+                calls = json.load(response)
+        finally:
+            mock.terminate()
+            mock.wait()
+
+    # ru_maxrss: kilobyte di Linux, byte di macOS
+    peak_rss = None
+    if resource is not None:
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        if sys.platform != "darwin":
+            peak_rss *= 1024
+    requests = sum(calls.values())
+    processed = len(cycle_times)
+
+    print()
+    print(
+        f"load benchmark: {args.accounts} accounts, "
+        f"{args.threads} workers{' (static)' if args.static else f' (adaptive, max {args.max_threads})'}, "
+        f"latency {args.latency:g}+{args.jitter:g} ms, error rate {args.error_rate:g}, "
+        f"rate limit {args.rate_limit:g}/s, dead accounts {args.dead_rate:g}"
+    )
+    print(f"{'accounts processed':<24}{processed:>12}")
+    print(f"{'wall time (s)':<24}{elapsed:>12.2f}")
+    print(f"{'accounts/s':<24}{processed / elapsed:>12.2f}")
+    if cycle_times:
+        print(f"{'cycle p50 (s)':<24}{percentile(cycle_times, 50):>12.3f}")
+        print(f"{'cycle p99 (s)':<24}{percentile(cycle_times, 99):>12.3f}")
+    if peak_rss is not None:
+        print(f"{'peak RSS (MiB)':<24}{peak_rss / 2**20:>12.1f}")
+    print(f"{'requests':<24}{requests:>12}")
+    print(f"{'requests/account':<24}{requests / max(processed, 1):>12.2f}")
+    for endpoint, count in sorted(calls.items()):
+        print(f"  {endpoint:<40}{count:>8}")
+
+
+def bench_replay(args) -> None:
+    cassette = main.Cassette("replay", args.cassette, args.latency_scale)
+    profiler = cProfile.Profile()
+    start = time.perf_counter()
+    profiler.enable()
+    try:
+        asyncio.run(main.main(cassette=cassette))
+    finally:
+        profiler.disable()
+    elapsed = time.perf_counter() - start
+
+    print()
+    print(f"replay benchmark: {args.cassette}, latency x{args.latency_scale:g}")
+    print(f"{'wall time (s)':<24}{elapsed:>12.2f}")
+    print(f"{'responses replayed':<24}{cassette.played:>12}")
+    print(f"{'responses/s':<24}{cassette.played / elapsed:>12.0f}")
+    if args.profile:
+        profiler.dump_stats(args.profile)
+        print(f"profile written to {args.profile}")
+    print()
+    pstats.Stats(profiler).strip_dirs().sort_stats(args.sort).print_stats(args.top)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Wagmi Hub bot benchmarks")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    decode = commands.add_parser("decode", help="decode_response microbenchmark")
+    decode.add_argument("--number", type=int, default=2000, help="calls per round")
+    decode.add_argument("--repeat", type=int, default=5, help="rounds per payload")
+    decode.set_defaults(func=bench_decode)
+
+    load = commands.add_parser("load", help="main() against mock_server.py")
+    load.add_argument("--accounts", type=int, default=200, help="synthetic accounts")
+    load.add_argument(
+        "--threads", type=int, default=10, help='"thread" (starting concurrency)'
+    )
+    load.add_argument(
+        "--max-threads", type=int, default=50, help="adaptive concurrency ceiling"
+    )
+    load.add_argument(
+        "--static", action="store_true", help="keep concurrency fixed at --threads"
+    )
+    load.add_argument(
+        "--phases",
+        default="daily,task,farming,game",
+        help="comma separated phases to enable",
+    )
+    load.add_argument("--latency", type=float, default=20, help="mock delay (ms)")
+    load.add_argument("--jitter", type=float, default=10, help="mock jitter (ms)")
+    load.add_argument("--error-rate", type=float, default=0, help="injected errors")
+    load.add_argument("--error-status", type=int, default=503)
+    load.add_argument("--tasks", type=int, default=10, help="tasks per account")
+    load.add_argument("--tickets", type=int, default=1, help="tickets per account")
+    load.add_argument(
+        "--dead-rate", type=float, default=0, help="share of accounts rejected at login"
+    )
+    load.add_argument(
+        "--rate-limit",
+        type=float,
+        default=0,
+        help="bot global rate limit, calls/s (0 = off)",
+    )
+    load.add_argument("--port", type=int, default=0, help="mock port (0 = free)")
+    load.add_argument("--log-level", default="warning", help="bot log_level")
+    load.set_defaults(func=bench_load)
+
+    replay = commands.add_parser("replay", help="main() from a recorded cassette")
+    replay.add_argument("cassette", help="file written by main.py --record")
+    replay.add_argument(
+        "--latency-scale",
+        type=float,
+        default=0,
+        help="multiply recorded latency (0 = no delay)",
+    )
+    replay.add_argument("--profile", help="also write the cProfile stats to a file")
+    replay.add_argument("--sort", default="cumulative", help="pstats sort key")
+    replay.add_argument("--top", type=int, default=25, help="functions to print")
+    replay.set_defaults(func=bench_replay)
+
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    args.func(args)
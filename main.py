@@ -1,17 +1,1712 @@
-from datetime import datetime
 import time
+
+# Titik awal untuk --profile-startup, sebelum import lainnya
+STARTUP_BEGAN = time.perf_counter()
+
+from datetime import datetime, timedelta, timezone
+import heapq
+import itertools
 from colorama import Fore
-import requests
+import aiohttp
 import random
-from fake_useragent import UserAgent
 import asyncio
 import json
-import gzip
-import brotli
+import os
+import base64
+import hashlib
+import sys
+import re
 import zlib
-import chardet
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
+import argparse
+import contextvars
+import contextlib
+import collections
+from array import array
+from urllib.parse import parse_qs
+from multidict import CIMultiDict, CIMultiDictProxy
+from yarl import URL
+from email.utils import parsedate_to_datetime
+
+try:
+    # orjson mem-parsing bytes jauh lebih cepat; opsional
+    import orjson
+
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
+
+# Level log, nilainya sama dengan konstanta di modul logging
+DEBUG, INFO, WARNING, ERROR = 10, 20, 30, 40
+
+
+class StartupProfile:
+    """
+    Wall-clock breakdown of a cold start, for --profile-startup.
+
+    mark() records the time since the previous mark under a name; the first
+    mark counts from STARTUP_BEGAN, i.e. the module imports. The report is
+    logged once the first API call goes out.
+    """
+
+    def __init__(self, began: float):
+        self.began = began
+        self.last = began
+        self.steps = []
+        self.enabled = False
+        self.done = False
+
+    def mark(self, name: str) -> None:
+        now = time.perf_counter()
+        self.steps.append((name, now - self.last))
+        self.last = now
+
+    def report(self) -> list:
+        """Marks the first API call and returns the breakdown as log lines."""
+        self.mark("until first API call")
+        self.done = True
+        total = self.last - self.began
+        lines = [f"⏱️ Startup took {total * 1000:.1f} ms to the first API call:"]
+        for name, seconds in self.steps:
+            lines.append(
+                f"    - {name:<24}{seconds * 1000:>9.1f} ms {seconds / total:>6.1%}"
+            )
+        return lines
+
+
+STARTUP = StartupProfile(STARTUP_BEGAN)
+STARTUP.mark("imports")
+
+
+class ApiResponse:
+    """
+    Buffered response returned by wagmihub.request.
+
+    The body is read eagerly so the connection goes straight back to the pool,
+    and the object exposes the same attributes the endpoint methods used on
+    requests.Response (status, headers, content, text, raise_for_status).
+    """
+
+    __slots__ = (
+        "status",
+        "reason",
+        "headers",
+        "content",
+        "url",
+        "cached",
+        "decoded",
+        "_info",
+        "_history",
+    )
+
+    def __init__(self, response: aiohttp.ClientResponse, content: bytes):
+        self.status = response.status
+        self.reason = response.reason
+        self.headers = response.headers
+        self.content = content
+        self.url = response.url
+        # True when served from ResponseCache after a 304
+        self.cached = False
+        # Hasil decode_response, disimpan agar response cache tidak di-parse ulang
+        self.decoded = None
+        self._info = response.request_info
+        self._history = response.history
+
+    @classmethod
+    def replayed(
+        cls, method: str, url: str, status: int, headers: dict, content: bytes
+    ) -> "ApiResponse":
+        """Builds a response from a cassette entry instead of the network."""
+        response = cls.__new__(cls)
+        response.status = status
+        response.reason = None
+        response.headers = CIMultiDictProxy(CIMultiDict(headers))
+        response.content = content
+        response.url = URL(url)
+        response.cached = False
+        response.decoded = None
+        response._info = aiohttp.RequestInfo(
+            response.url, method, CIMultiDictProxy(CIMultiDict()), response.url
+        )
+        response._history = ()
+        return response
+
+    @property
+    def text(self) -> str:
+        return self.content.decode("utf-8", errors="replace")
+
+    def raise_for_status(self) -> None:
+        if self.status >= 400:
+            raise aiohttp.ClientResponseError(
+                self._info,
+                self._history,
+                status=self.status,
+                message=self.reason or "",
+                headers=self.headers,
+            )
+
+
+# Label akun yang sedang diproses, dipakai sebagai tag di setiap baris log
+current_account = contextvars.ContextVar("current_account", default=None)
+
+
+class AsyncLogger:
+    """
+    Queue-backed console logger.
+
+    log() only filters by level, formats the line and enqueues it; a
+    background task writes queued lines to the stream in batches, so the
+    request path never blocks on stdout. Each line is tagged with the
+    account label from current_account, and the timestamp prefix is
+    formatted at most once per second. Until start() is called (and after
+    stop()) lines are written directly.
+    """
+
+    LEVELS = {"debug": DEBUG, "info": INFO, "warning": WARNING, "error": ERROR}
+
+    def __init__(self, level: int = INFO, stream=None):
+        self.level = level
+        self.stream = stream or sys.stdout
+        self.queue = None
+        self.task = None
+        self._second = None
+        self._stamp = ""
+
+    def set_level(self, name: str) -> None:
+        self.level = self.LEVELS.get(str(name).lower(), INFO)
+
+    def timestamp(self) -> str:
+        now = int(time.time())
+        if now != self._second:
+            self._second = now
+            self._stamp = (
+                Fore.LIGHTBLACK_EX
+                + datetime.fromtimestamp(now).strftime("[%Y:%m:%d ~ %H:%M:%S] |")
+                + " "
+            )
+        return self._stamp
+
+    def log(self, message: str, color: str = Fore.RESET, level: int = INFO) -> None:
+        if level < self.level:
+            return
+        label = current_account.get()
+        tag = f"[{label}] " if label else ""
+        line = f"{self.timestamp()}{color}{tag}{message}{Fore.RESET}"
+        if self.queue is None:
+            self._write([line])
+        else:
+            self.queue.put_nowait(line)
+
+    def _write(self, lines: list) -> None:
+        text = "\n".join(lines) + "\n"
+        # Hindari UnicodeEncodeError di console yang tidak mendukung emoji
+        text = text.encode("utf-8", "backslashreplace").decode("utf-8")
+        try:
+            self.stream.write(text)
+        except UnicodeEncodeError:
+            encoding = getattr(self.stream, "encoding", None) or "ascii"
+            self.stream.write(text.encode(encoding, "replace").decode(encoding))
+        self.stream.flush()
+
+    def _drain(self, lines: list, limit: int = 1000) -> list:
+        while len(lines) < limit and not self.queue.empty():
+            lines.append(self.queue.get_nowait())
+        return lines
+
+    async def _writer(self) -> None:
+        while True:
+            lines = self._drain([await self.queue.get()])
+            self._write(lines)
+
+    def start(self) -> None:
+        """Starts the background writer. Must be called inside the event loop."""
+        if self.task is None:
+            self.queue = asyncio.Queue()
+            self.task = asyncio.create_task(self._writer())
+
+    async def stop(self) -> None:
+        """Writes whatever is still queued and stops the background writer."""
+        if self.task is None:
+            return
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+        lines = self._drain([], limit=sys.maxsize)
+        self.queue = None
+        self.task = None
+        if lines:
+            self._write(lines)
+
+
+def account_key(query: str) -> str:
+    """
+    Returns a stable identifier for an account.
+
+    The Telegram user id inside the initData is used when it can be parsed,
+    so the key survives a refreshed query string; otherwise the query itself
+    is hashed.
+    """
+    try:
+        user = json.loads(parse_qs(query)["user"][0])
+        return f"user-{user['id']}"
+    except (KeyError, IndexError, TypeError, ValueError):
+        return hashlib.sha256(query.encode("utf-8")).hexdigest()[:16]
+
+
+def shard_of(key: str, shard_count: int) -> int:
+    """
+    Maps an account key to a shard index in [0, shard_count).
+
+    Uses sha256 rather than hash() so the result is the same in every
+    process and on every host.
+    """
+    digest = hashlib.sha256(key.encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % shard_count
+
+
+class AccountSource:
+    """
+    The accounts in query.txt, indexed without keeping the lines in memory.
+
+    refresh() scans the file through a memory map and keeps only the byte
+    offset, length and CRC32 of every non-empty line, plus the line number of
+    each account_key(). query() reads a single line back when an account has to
+    log in. The file is rescanned only when its mtime or size changes; if
+    lines were only appended, just the new tail is scanned, so adding
+    accounts to a large file does not re-parse the existing ones.
+
+    Every rescan bumps version, and the keys it added or removed are
+    collected until take_changes() is called, so a rescan triggered by
+    query() is not lost for the watcher.
+    """
+
+    CHUNK = 1 << 20
+
+    def __init__(self, path: str):
+        self.path = path
+        self.offsets = array("Q")
+        self.lengths = array("L")
+        self.checksums = array("L")
+        self.lines = {}
+        self.stamp = None
+        # Bagian file yang sudah di-index sampai newline terakhir
+        self.indexed = 0
+        self.digest = hashlib.blake2b().digest()
+        self.version = 0
+        self.added = set()
+        self.removed = set()
+
+    def __len__(self) -> int:
+        return len(self.lines)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.lines
+
+    def keys(self) -> list:
+        """Account keys in file order."""
+        return sorted(self.lines, key=self.lines.get)
+
+    def line_number(self, key: str) -> int:
+        return self.lines[key]
+
+    def checksum(self, key: str) -> int:
+        """CRC32 of the account's line, or None if it is not in the file."""
+        line = self.lines.get(key)
+        return None if line is None else self.checksums[line]
+
+    @classmethod
+    def _digest(cls, view, end: int) -> bytes:
+        digest = hashlib.blake2b()
+        for start in range(0, end, cls.CHUNK):
+            digest.update(view[start : min(end, start + cls.CHUNK)])
+        return digest.digest()
+
+    def refresh(self) -> tuple:
+        """
+        Re-indexes the file if it changed since the last call.
+
+        Returns:
+            tuple: (added, removed) account keys; both empty if unchanged.
+
+        Raises:
+            OSError: If the file cannot be read.
+        """
+        stat = os.stat(self.path)
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        if stamp == self.stamp:
+            return [], []
+        old_keys = set(self.lines)
+
+        if stat.st_size == 0:
+            self._reset()
+        else:
+            import mmap
+
+            with open(self.path, "rb") as file, mmap.mmap(
+                file.fileno(), 0, access=mmap.ACCESS_READ
+            ) as view:
+                appended = (
+                    self.indexed <= len(view)
+                    and self._digest(view, self.indexed) == self.digest
+                )
+                if not appended:
+                    self._reset()
+                # Baris terakhir tanpa newline bisa saja masih bertambah
+                while self.offsets and self.offsets[-1] >= self.indexed:
+                    self.offsets.pop()
+                    self.lengths.pop()
+                    self.checksums.pop()
+                    self.lines = {
+                        key: line
+                        for key, line in self.lines.items()
+                        if line < len(self.offsets)
+                    }
+                self._scan(view, self.indexed)
+                self.digest = self._digest(view, self.indexed)
+        self.stamp = stamp
+        self.version += 1
+
+        new_keys = set(self.lines)
+        added, removed = new_keys - old_keys, old_keys - new_keys
+        # Gabungkan dengan perubahan yang belum diambil take_changes()
+        for key in removed:
+            if key in self.added:
+                self.added.discard(key)
+            else:
+                self.removed.add(key)
+        for key in added:
+            if key in self.removed:
+                self.removed.discard(key)
+            else:
+                self.added.add(key)
+        return list(added), list(removed)
+
+    def take_changes(self) -> tuple:
+        """
+        Returns the keys added and removed since the previous call.
+
+        Returns:
+            tuple: (added, removed) account keys.
+        """
+        added, removed = list(self.added), list(self.removed)
+        self.added.clear()
+        self.removed.clear()
+        return added, removed
+
+    def _reset(self) -> None:
+        self.offsets = array("Q")
+        self.lengths = array("L")
+        self.checksums = array("L")
+        self.lines = {}
+        self.indexed = 0
+        self.digest = hashlib.blake2b().digest()
+
+    def _scan(self, view, start: int) -> None:
+        end = len(view)
+        while start < end:
+            newline = view.find(b"\n", start)
+            stop = end if newline == -1 else newline
+            line = view[start:stop]
+            query = line.strip()
+            if query:
+                offset = start + line.index(query[:1])
+                self.lines[account_key(query.decode("utf-8", "replace"))] = len(
+                    self.offsets
+                )
+                self.offsets.append(offset)
+                self.lengths.append(len(query))
+                self.checksums.append(zlib.crc32(query))
+            if newline == -1:
+                break
+            start = newline + 1
+            self.indexed = start
+
+    def query(self, key: str) -> str:
+        """
+        Reads the query of an account back from the file.
+
+        Returns:
+            str: The query, or None if the account is no longer in the file.
+        """
+        for attempt in range(2):
+            line = self.lines.get(key)
+            if line is None:
+                return None
+            try:
+                with open(self.path, "rb") as file:
+                    file.seek(self.offsets[line])
+                    raw = file.read(self.lengths[line])
+            except OSError:
+                return None
+            if zlib.crc32(raw) == self.checksums[line]:
+                return raw.decode("utf-8", "replace")
+            # File berubah sejak di-index terakhir
+            self.refresh()
+        return None
+
+
+class TokenCache:
+    """
+    Access tokens kept between runs, keyed by account_key().
+
+    A token is reused until its expiry: the JWT "exp" claim when it can be
+    decoded, otherwise default_ttl seconds after it was stored. Changes are
+    only written to disk by save(), so a large account list does not rewrite
+    the file on every login. With path None the cache is kept in memory only.
+    """
+
+    def __init__(self, path: str, default_ttl: int = 3600, margin: int = 60):
+        self.path = path
+        self.default_ttl = default_ttl
+        self.margin = margin
+        self.entries = {}
+        self.dirty = False
+
+    @staticmethod
+    def token_expiry(token: str) -> float:
+        """Decodes the "exp" claim of a JWT, or returns None."""
+        try:
+            payload = token.split(".")[1]
+            payload += "=" * (-len(payload) % 4)
+            exp = json.loads(base64.urlsafe_b64decode(payload)).get("exp")
+            return float(exp) if exp else None
+        except (AttributeError, IndexError, TypeError, ValueError):
+            return None
+
+    def load(self) -> int:
+        """Reads the cache file and returns the number of tokens loaded."""
+        if self.path is None:
+            return 0
+        try:
+            with open(self.path, "r", encoding="utf-8") as file:
+                entries = json.load(file)
+        except (OSError, ValueError):
+            return 0
+        if isinstance(entries, dict):
+            self.entries = entries
+        return len(self.entries)
+
+    def save(self) -> None:
+        """Writes the cache to disk if it changed, dropping expired tokens."""
+        if not self.dirty or self.path is None:
+            return
+        now = time.time()
+        self.entries = {
+            key: entry
+            for key, entry in self.entries.items()
+            if entry.get("expires_at", 0) > now
+        }
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(self.entries, file)
+        os.replace(tmp_path, self.path)
+        self.dirty = False
+
+    def get(self, key: str) -> str:
+        """Returns the cached token for the account if it is still valid."""
+        entry = self.entries.get(key)
+        if entry and entry.get("expires_at", 0) - self.margin > time.time():
+            return entry.get("token")
+        return None
+
+    def put(self, key: str, token: str) -> None:
+        expires_at = self.token_expiry(token) or time.time() + self.default_ttl
+        self.entries[key] = {"token": token, "expires_at": expires_at}
+        self.dirty = True
+
+    def drop(self, key: str) -> None:
+        if self.entries.pop(key, None) is not None:
+            self.dirty = True
+
+
+class StateStore:
+    """
+    Per-account state kept in SQLite between cycles and runs.
+
+    Records what the bot last learned about each account (gamedata fields,
+    claim timestamps, completed task uuids) so phases can skip calls known
+    to be useless and a restarted bot resumes where it stopped. save() and
+    task_done() only buffer; flush() writes everything in one transaction
+    and is called every "state_flush_interval" seconds and on shutdown.
+    """
+
+    FIELDS = (
+        "crack_time",
+        "daily_claimed",
+        "daily_checked_at",
+        "mining_claimed_at",
+        "ticket_count",
+        "balance",
+        "tasks_checked_at",
+        "login_failures",
+        "quarantined_until",
+        "quarantine_checksum",
+    )
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS accounts (
+            key TEXT PRIMARY KEY,
+            crack_time REAL,
+            daily_claimed INTEGER,
+            daily_checked_at REAL,
+            mining_claimed_at REAL,
+            ticket_count INTEGER,
+            balance INTEGER,
+            tasks_checked_at REAL,
+            login_failures INTEGER,
+            quarantined_until REAL,
+            quarantine_checksum INTEGER,
+            updated_at REAL
+        );
+        CREATE TABLE IF NOT EXISTS completed_tasks (
+            key TEXT,
+            uuid TEXT,
+            completed_at REAL,
+            PRIMARY KEY (key, uuid)
+        );
+    """
+
+    def __init__(self, path: str):
+        # sqlite3 dimuat saat store dibuka, bukan saat modul di-import
+        import sqlite3
+
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(self.SCHEMA)
+        self.rows = {}
+        self.tasks = []
+
+    def load(self, key: str) -> dict:
+        """Returns the stored state of an account, or None if there is none."""
+        row = self.db.execute(
+            f"SELECT {', '.join(self.FIELDS)} FROM accounts WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        state = dict(zip(self.FIELDS, row))
+        if state["daily_claimed"] is not None:
+            state["daily_claimed"] = bool(state["daily_claimed"])
+        state["completed_tasks"] = {
+            uuid
+            for (uuid,) in self.db.execute(
+                "SELECT uuid FROM completed_tasks WHERE key = ?", (key,)
+            )
+        }
+        return state
+
+    def save(self, ctx) -> None:
+        self.rows[ctx.key] = tuple(getattr(ctx, field) for field in self.FIELDS)
+
+    def task_done(self, key: str, uuid: str) -> None:
+        self.tasks.append((key, uuid, time.time()))
+
+    def flush(self) -> int:
+        """Writes the buffered changes. Returns the number of rows written."""
+        if not self.rows and not self.tasks:
+            return 0
+        now = time.time()
+        columns = ", ".join(self.FIELDS)
+        updates = ", ".join(f"{field} = excluded.{field}" for field in self.FIELDS)
+        with self.db:
+            self.db.executemany(
+                f"INSERT INTO accounts (key, {columns}, updated_at) "
+                f"VALUES (?, {', '.join('?' * len(self.FIELDS))}, ?) "
+                f"ON CONFLICT(key) DO UPDATE SET {updates}, updated_at = excluded.updated_at",
+                [(key, *values, now) for key, values in self.rows.items()],
+            )
+            self.db.executemany(
+                "INSERT OR IGNORE INTO completed_tasks (key, uuid, completed_at) "
+                "VALUES (?, ?, ?)",
+                self.tasks,
+            )
+        written = len(self.rows) + len(self.tasks)
+        self.rows.clear()
+        self.tasks.clear()
+        return written
+
+    def close(self) -> None:
+        self.flush()
+        self.db.close()
+
+
+class ProxyStats:
+    """Health counters for one proxy."""
+
+    __slots__ = (
+        "latency",
+        "successes",
+        "failures",
+        "consecutive_failures",
+        "open_until",
+    )
+
+    def __init__(self):
+        self.latency = None
+        self.successes = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+
+
+class ProxyPool:
+    """
+    Health-checked proxies with sticky per-account assignment.
+
+    All proxies are probed concurrently (check_all) at startup and then again
+    in the background. Proxies are scored by probe latency and failure rate,
+    and each account keeps the proxy it was given as long as that proxy stays
+    available. After max_failures consecutive failures (from probes or real
+    traffic) a proxy's circuit opens and it is out of rotation for cooldown
+    seconds; accounts on it move to the next best proxy.
+    """
+
+    def __init__(self, proxies: list, max_failures: int = 3, cooldown: float = 300):
+        self.stats = {proxy: ProxyStats() for proxy in proxies}
+        self.max_failures = max_failures
+        self.cooldown = cooldown
+        self.assigned = {}
+        self.load = {proxy: 0 for proxy in proxies}
+
+    def __len__(self) -> int:
+        return len(self.stats)
+
+    def is_available(self, proxy: str) -> bool:
+        """A proxy is available once a probe succeeded and its circuit is closed."""
+        stats = self.stats[proxy]
+        return stats.latency is not None and stats.open_until <= time.time()
+
+    def available(self) -> list:
+        return [proxy for proxy in self.stats if self.is_available(proxy)]
+
+    def score(self, proxy: str) -> float:
+        """Lower is better: probe latency weighted by the failure rate."""
+        stats = self.stats[proxy]
+        total = stats.successes + stats.failures
+        failure_rate = stats.failures / total if total else 0.0
+        return (stats.latency or 1.0) * (1 + 4 * failure_rate)
+
+    def record(self, proxy: str, ok: bool, latency: float = None) -> None:
+        """Records the outcome of a probe or of real traffic through the proxy."""
+        stats = self.stats.get(proxy)
+        if stats is None:
+            return
+        if ok:
+            stats.successes += 1
+            stats.consecutive_failures = 0
+            stats.open_until = 0.0
+            if latency is not None:
+                stats.latency = (
+                    latency
+                    if stats.latency is None
+                    else 0.7 * stats.latency + 0.3 * latency
+                )
+        else:
+            stats.failures += 1
+            stats.consecutive_failures += 1
+            if stats.consecutive_failures >= self.max_failures:
+                stats.open_until = time.time() + self.cooldown
+
+    def assign(self, key: str) -> str:
+        """
+        Returns the account's proxy, keeping its current one while available.
+
+        New assignments go to the proxy with the best score, weighted by how
+        many accounts already use it. Returns None when no proxy is available.
+        """
+        current = self.assigned.get(key)
+        if current is not None:
+            if self.is_available(current):
+                return current
+            self.load[current] -= 1
+            del self.assigned[key]
+
+        candidates = self.available()
+        if not candidates:
+            return None
+        proxy = min(candidates, key=lambda p: self.score(p) * (1 + self.load[p]))
+        self.assigned[key] = proxy
+        self.load[proxy] += 1
+        return proxy
+
+    async def check_all(self, probe) -> int:
+        """
+        Probes every proxy concurrently.
+
+        Args:
+            probe: Coroutine function taking a proxy URL and returning True if it works.
+
+        Returns:
+            int: Number of proxies available after the check.
+        """
+
+        async def check(proxy):
+            start = time.monotonic()
+            ok = await probe(proxy)
+            self.record(proxy, ok, time.monotonic() - start if ok else None)
+
+        await asyncio.gather(*(check(proxy) for proxy in self.stats))
+        return len(self.available())
+
+
+class Metrics:
+    """
+    In-process counters, gauges and histograms for API calls and phases.
+
+    render() produces the Prometheus text exposition format, which can be
+    written to a file (write) or served over HTTP (serve).
+    """
+
+    BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+    HELP = {
+        "wagmi_http_requests_total": ("counter", "API calls by endpoint and status."),
+        "wagmi_http_request_duration_seconds": (
+            "histogram",
+            "API call latency by endpoint.",
+        ),
+        "wagmi_http_request_bytes_total": ("counter", "Request body bytes sent."),
+        "wagmi_http_response_bytes_total": ("counter", "Response body bytes received."),
+        "wagmi_phase_duration_seconds": ("histogram", "Duration of account phases."),
+        "wagmi_phase_errors_total": ("counter", "Phases that raised an exception."),
+        "wagmi_account_cycle_duration_seconds": (
+            "histogram",
+            "Time to process one account.",
+        ),
+        "wagmi_accounts_processed_total": ("counter", "Accounts processed."),
+        "wagmi_account_errors_total": (
+            "counter",
+            "Account cycles that ended with an unexpected exception.",
+        ),
+        "wagmi_account_timeouts_total": (
+            "counter",
+            "Account cycles cancelled after exceeding account_timeout.",
+        ),
+        "wagmi_login_failures_total": (
+            "counter",
+            "Failed logins; rejected ones put the account in quarantine.",
+        ),
+        "wagmi_response_cache_hits_total": (
+            "counter",
+            "Conditional requests answered with 304 and served from the cache.",
+        ),
+    }
+    _ID_SEGMENT = re.compile(r"^(\d+|[0-9a-fA-F-]{16,})$")
+
+    def __init__(self):
+        self.counters = {}
+        self.histograms = {}
+        self.gauges = {}
+
+    @staticmethod
+    def _labels(labels: dict) -> tuple:
+        return tuple(sorted(labels.items())) if labels else ()
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        key = (name, self._labels(labels))
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        key = (name, self._labels(labels))
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            # [count per bucket..., sum, count]
+            histogram = self.histograms[key] = [0] * (len(self.BUCKETS) + 2)
+        for i, bound in enumerate(self.BUCKETS):
+            if value <= bound:
+                histogram[i] += 1
+                break
+        histogram[-2] += value
+        histogram[-1] += 1
+
+    def value(self, name: str, **labels) -> float:
+        """Current value of a counter (0 if it was never incremented)."""
+        return self.counters.get((name, self._labels(labels)), 0)
+
+    def gauge(self, name: str, help_text: str, value) -> None:
+        """Sets a gauge to a number or to a callable evaluated at render time."""
+        self.gauges[name] = (help_text, value)
+
+    @classmethod
+    def endpoint_label(cls, endpoint: str) -> str:
+        """Replaces ids in the path (task uuids, bet ids) with {id}."""
+        return "/".join(
+            "{id}" if cls._ID_SEGMENT.match(part) else part
+            for part in endpoint.split("/")
+        )
+
+    def observe_request(
+        self, endpoint: str, status, seconds: float, received: int, sent: int
+    ) -> None:
+        endpoint = self.endpoint_label(endpoint)
+        self.inc("wagmi_http_requests_total", endpoint=endpoint, status=str(status))
+        self.observe("wagmi_http_request_duration_seconds", seconds, endpoint=endpoint)
+        self.inc("wagmi_http_response_bytes_total", received, endpoint=endpoint)
+        self.inc("wagmi_http_request_bytes_total", sent, endpoint=endpoint)
+
+    @contextlib.contextmanager
+    def phase(self, name: str):
+        """Times an account phase (login, daily, task, farming, game)."""
+        start = time.monotonic()
+        try:
+            yield
+        except Exception:
+            self.inc("wagmi_phase_errors_total", phase=name)
+            raise
+        finally:
+            self.observe(
+                "wagmi_phase_duration_seconds", time.monotonic() - start, phase=name
+            )
+
+    @staticmethod
+    def _format(name: str, labels: tuple, value, extra: tuple = ()) -> str:
+        pairs = labels + extra
+        if pairs:
+            inner = ",".join(
+                '{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"'))
+                for k, v in pairs
+            )
+            return f"{name}{{{inner}}} {value}"
+        return f"{name} {value}"
+
+    def render(self) -> str:
+        lines = []
+        names = sorted(
+            {name for name, _ in self.counters} | {name for name, _ in self.histograms}
+        )
+        for name in names:
+            kind, help_text = self.HELP.get(name, ("untyped", name))
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            if kind == "histogram":
+                for (metric, labels), histogram in sorted(self.histograms.items()):
+                    if metric != name:
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(self.BUCKETS, histogram):
+                        cumulative += count
+                        lines.append(
+                            self._format(
+                                f"{name}_bucket", labels, cumulative, (("le", bound),)
+                            )
+                        )
+                    lines.append(
+                        self._format(
+                            f"{name}_bucket", labels, histogram[-1], (("le", "+Inf"),)
+                        )
+                    )
+                    lines.append(self._format(f"{name}_sum", labels, histogram[-2]))
+                    lines.append(self._format(f"{name}_count", labels, histogram[-1]))
+            else:
+                for (metric, labels), value in sorted(self.counters.items()):
+                    if metric == name:
+                        lines.append(self._format(name, labels, value))
+        for name, (help_text, value) in sorted(self.gauges.items()):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(self._format(name, (), value() if callable(value) else value))
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str) -> None:
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            file.write(self.render())
+        os.replace(tmp_path, path)
+
+    async def serve(self, host: str, port: int) -> "aiohttp.web.AppRunner":
+        """Serves GET /metrics on host:port and returns the runner."""
+        # aiohttp.web hanya dimuat bila metrics_port dipakai
+        from aiohttp import web
+
+        async def handle(request):
+            return web.Response(
+                text=self.render(), content_type="text/plain", charset="utf-8"
+            )
+
+        app = web.Application()
+        app.router.add_get("/metrics", handle)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        try:
+            await web.TCPSite(runner, host, port).start()
+        except OSError:
+            # Port sudah dipakai: lepas runner sebelum error diteruskan
+            await runner.cleanup()
+            raise
+        return runner
+
+
+class TokenBucket:
+    """
+    Token bucket that hands out reservations.
+
+    reserve() always takes a token, letting the balance go negative, and
+    returns how long the caller has to wait for it. There is no await
+    between checking and taking, so concurrent coroutines cannot race.
+    """
+
+    __slots__ = ("rate", "max_rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.max_rate = rate
+        self.capacity = max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def reserve(self, now: float) -> float:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        return -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+    def slow_down(self) -> None:
+        self.rate = max(self.max_rate * 0.05, self.rate * 0.5)
+
+    def speed_up(self) -> None:
+        self.rate = min(self.max_rate, self.rate + self.max_rate * 0.05)
+
+
+class RateLimiter:
+    """
+    Client-side rate limiting for API calls.
+
+    Every call takes a token from the global bucket and, when one is
+    configured for its endpoint, from that endpoint's bucket. A 429 pauses all
+    calls until its Retry-After (or retry_after seconds when the header is
+    missing) and halves the rates involved; successful calls win the rate
+    back gradually, up to the configured value.
+
+    Config ("rate_limit" in config.json):
+        global (float): Calls per second across all endpoints; 0 disables it.
+        endpoints (dict): Calls per second keyed by endpoint prefix,
+            e.g. {"binary/place-bet": 2, "gametask/complete": 5}.
+        retry_after (float): Pause after a 429 without a Retry-After header.
+    """
+
+    def __init__(self, base_url: str, config: dict):
+        self.base_url = base_url
+        global_rate = config.get("global", 20)
+        self.global_bucket = TokenBucket(global_rate) if global_rate else None
+        self.buckets = {
+            endpoint.strip("/"): TokenBucket(rate)
+            for endpoint, rate in config.get("endpoints", {}).items()
+            if rate
+        }
+        self.retry_after = config.get("retry_after", 5)
+        self.blocked_until = 0.0
+
+    def endpoint(self, url: str) -> str:
+        """Returns the API path of the url, or None for non-API urls."""
+        if not url.startswith(self.base_url):
+            return None
+        return url[len(self.base_url) :].split("?")[0].strip("/")
+
+    def _bucket(self, endpoint: str) -> TokenBucket:
+        match = None
+        for prefix in self.buckets:
+            if endpoint == prefix or endpoint.startswith(prefix + "/"):
+                if match is None or len(prefix) > len(match):
+                    match = prefix
+        return self.buckets.get(match)
+
+    async def acquire(self, endpoint: str) -> None:
+        now = time.monotonic()
+        wait = self.blocked_until - now
+        for bucket in (self.global_bucket, self._bucket(endpoint)):
+            if bucket is not None:
+                wait = max(wait, bucket.reserve(now))
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def parse_retry_after(self, value: str) -> float:
+        if value:
+            try:
+                return max(0.0, float(value))
+            except ValueError:
+                pass
+            try:
+                retry_at = parsedate_to_datetime(value)
+                return max(0.0, retry_at.timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+        return self.retry_after
+
+    def on_response(self, endpoint: str, status: int, retry_after: str = None):
+        """
+        Feeds a response back into the limiter.
+
+        Returns:
+            float: The pause applied for a 429, otherwise None.
+        """
+        buckets = [self.global_bucket, self._bucket(endpoint)]
+        if status == 429:
+            delay = self.parse_retry_after(retry_after)
+            self.blocked_until = max(self.blocked_until, time.monotonic() + delay)
+            for bucket in buckets:
+                if bucket is not None:
+                    bucket.slow_down()
+            return delay
+        for bucket in buckets:
+            if bucket is not None:
+                bucket.speed_up()
+        return None
+
+
+class ConcurrencyController:
+    """
+    AIMD limit on the number of accounts processed at the same time.
+
+    The HTTP layer reports every API call through observe(). Every interval
+    adjust() looks at the calls since the previous adjustment: while p95
+    latency stays under target_p95 and the error rate (5xx, 429, connection
+    errors and timeouts) under max_error_rate, the limit grows by one, but
+    only if it was actually reached; otherwise it is multiplied by backoff.
+    Workers hold a slot (async with controller) for each account, so a
+    lower limit takes effect as running accounts finish.
+    """
+
+    def __init__(
+        self,
+        initial: int,
+        minimum: int = 1,
+        maximum: int = 50,
+        target_p95: float = 2.0,
+        max_error_rate: float = 0.05,
+        backoff: float = 0.5,
+        min_samples: int = 20,
+    ):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = min(max(initial, self.minimum), self.maximum)
+        self.target_p95 = target_p95
+        self.max_error_rate = max_error_rate
+        self.backoff = backoff
+        self.min_samples = min_samples
+        self.samples = collections.deque(maxlen=10000)
+        self.in_use = 0
+        self.active = 0
+        self.peak = 0
+        self.p95 = None
+        self.error_rate = None
+        self._slots = asyncio.Condition()
+
+    @classmethod
+    def from_config(cls, config: dict) -> "ConcurrencyController":
+        """
+        Builds the controller from "concurrency"; "thread" is the starting
+        limit. "concurrency": false keeps the limit fixed at "thread". The
+        ceiling defaults to 50, or to "thread" when that is higher, so an
+        existing "thread" setting is never lowered.
+        """
+        threads = config.get("thread", 1)
+        settings = config.get("concurrency", {})
+        if settings is False:
+            return cls(threads, minimum=threads, maximum=threads)
+        return cls(
+            threads,
+            minimum=settings.get("min", 1),
+            maximum=settings.get("max", max(50, threads)),
+            target_p95=settings.get("target_p95", 2.0),
+            max_error_rate=settings.get("max_error_rate", 0.05),
+            backoff=settings.get("backoff", 0.5),
+        )
+
+    @property
+    def fixed(self) -> bool:
+        return self.minimum == self.maximum
+
+    async def __aenter__(self):
+        async with self._slots:
+            await self._slots.wait_for(lambda: self.in_use < self.limit)
+            self.in_use += 1
+        return self
+
+    async def __aexit__(self, *exc_info):
+        async with self._slots:
+            self.in_use -= 1
+            self._slots.notify()
+
+    def observe(self, seconds: float, ok: bool) -> None:
+        self.samples.append((seconds, ok))
+
+    def busy(self, count: int) -> None:
+        """Records how many accounts are being processed right now."""
+        self.active = count
+        self.peak = max(self.peak, count)
+
+    async def adjust(self) -> int:
+        """
+        Applies one AIMD step.
+
+        Returns:
+            int: The previous limit, or None if there were too few calls.
+        """
+        samples, peak = list(self.samples), self.peak
+        self.samples.clear()
+        self.peak = self.active
+        if len(samples) < self.min_samples:
+            return None
+
+        latencies = sorted(seconds for seconds, _ in samples)
+        self.p95 = latencies[int(0.95 * (len(latencies) - 1))]
+        self.error_rate = sum(1 for _, ok in samples if not ok) / len(samples)
+
+        previous = self.limit
+        if self.p95 > self.target_p95 or self.error_rate > self.max_error_rate:
+            self.limit = max(self.minimum, int(self.limit * self.backoff))
+        elif peak >= self.limit:
+            self.limit = min(self.maximum, self.limit + 1)
+        if self.limit > previous:
+            async with self._slots:
+                self._slots.notify(self.limit - previous)
+        return previous
+
+
+class Cassette:
+    """
+    Recorded API traffic, for offline and repeatable runs.
+
+    In "record" mode every request/response pair sent through
+    wagmihub._send is kept and written by save() as gzipped JSON lines.
+    In "replay" mode load() reads such a file and play() answers requests
+    from memory, sleeping for the recorded latency times latency_scale (0
+    = no delay). Entries are matched on (account, method, url); repeated
+    calls get the recorded responses in order, and the last one again once
+    they run out. URLs under base_url are stored relative to it, so a
+    cassette can be replayed against any base URL.
+    """
+
+    HEADERS = ("Content-Type", "ETag", "Last-Modified", "Retry-After")
+
+    def __init__(self, mode: str, path: str, latency_scale: float = 1.0):
+        self.mode = mode
+        self.path = path
+        self.latency_scale = latency_scale
+        self.base_url = ""
+        self.entries = []
+        self.tapes = {}
+        self.played = 0
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == "replay"
+
+    def _relative(self, url: str) -> str:
+        if self.base_url and url.startswith(self.base_url):
+            return url[len(self.base_url) :]
+        return url
+
+    def record(
+        self, method: str, url: str, account: str, response, elapsed: float
+    ) -> None:
+        self.entries.append(
+            {
+                "a": account or "",
+                "m": method,
+                "u": self._relative(url),
+                "s": response.status,
+                "h": {
+                    name: response.headers[name]
+                    for name in self.HEADERS
+                    if name in response.headers
+                },
+                "b": response.content.decode("utf-8", "surrogateescape"),
+                "t": round(elapsed, 4),
+            }
+        )
+
+    def save(self) -> int:
+        """Writes the recorded entries. Returns how many were written."""
+        import gzip
+
+        with gzip.open(self.path, "wt", encoding="utf-8") as file:
+            for entry in self.entries:
+                file.write(json.dumps(entry, separators=(",", ":")) + "\n")
+        return len(self.entries)
+
+    def load(self) -> int:
+        """Reads a cassette for replay. Returns the number of entries."""
+        import gzip
+
+        self.tapes = {}
+        with gzip.open(self.path, "rt", encoding="utf-8") as file:
+            for line in file:
+                entry = json.loads(line)
+                key = (entry["a"], entry["m"], entry["u"])
+                self.tapes.setdefault(key, collections.deque()).append(entry)
+        return sum(len(tape) for tape in self.tapes.values())
+
+    async def play(self, method: str, url: str, account: str) -> ApiResponse:
+        """
+        Returns the next recorded response for the request.
+
+        Raises:
+            aiohttp.ClientConnectionError: If the request was never recorded.
+        """
+        tape = self.tapes.get((account or "", method, self._relative(url)))
+        if not tape:
+            raise aiohttp.ClientConnectionError(
+                f"{method} {url} is not in the cassette"
+            )
+        entry = tape.popleft() if len(tape) > 1 else tape[0]
+        self.played += 1
+        if self.latency_scale > 0:
+            await asyncio.sleep(entry["t"] * self.latency_scale)
+        return ApiResponse.replayed(
+            method,
+            url,
+            entry["s"],
+            entry["h"],
+            entry["b"].encode("utf-8", "surrogateescape"),
+        )
+
+
+class SessionPool:
+    """
+    Keep-alive aiohttp sessions, one per proxy (None means direct).
+
+    Each session owns its own connector, so the pool size applies per proxy
+    and per host. Connection creation and reuse are counted through a trace
+    config so the reuse ratio can be reported after every loop. timeout is
+    the default for every request made through the pool. Once close() has
+    run, get() refuses to open new sessions.
+    """
+
+    def __init__(
+        self,
+        limit: int = 100,
+        limit_per_host: int = 20,
+        timeout: aiohttp.ClientTimeout = None,
+    ):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.timeout = timeout or aiohttp.ClientTimeout(total=60)
+        self.closed = False
+        self.sessions = {}
+        self.created = 0
+        self.reused = 0
+        self.trace_config = aiohttp.TraceConfig()
+        self.trace_config.on_connection_create_end.append(self._on_create)
+        self.trace_config.on_connection_reuseconn.append(self._on_reuse)
+
+    async def _on_create(self, session, context, params):
+        self.created += 1
+
+    async def _on_reuse(self, session, context, params):
+        self.reused += 1
+
+    def get(self, proxy: str = None) -> aiohttp.ClientSession:
+        """
+        Returns the pooled session for the proxy, creating it on first use.
+
+        Raises:
+            aiohttp.ClientConnectionError: If the pool is already closed.
+        """
+        if self.closed:
+            raise aiohttp.ClientConnectionError("Session pool is closed")
+        session = self.sessions.get(proxy)
+        if session is None or session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit, limit_per_host=self.limit_per_host
+            )
+            session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=self.timeout,
+                trace_configs=[self.trace_config],
+            )
+            self.sessions[proxy] = session
+        return session
+
+    def reuse_ratio(self) -> float:
+        """Share of requests served on an already open connection."""
+        total = self.created + self.reused
+        return self.reused / total if total else 0.0
+
+    async def close(self) -> None:
+        self.closed = True
+        for session in self.sessions.values():
+            await session.close()
+        self.sessions.clear()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+
+class ResponseCache:
+    """
+    Bounded LRU cache of responses that carry an ETag or Last-Modified.
+
+    Entries are keyed by (account key, url), since every account sees its
+    own task list, and hold only the validators and the decoded body.
+    request() sends the stored validators as If-None-Match /
+    If-Modified-Since and answers a 304 with the cached body, so an
+    unchanged list is neither downloaded nor parsed again. With more
+    accounts than max_entries the oldest entries are evicted and those
+    accounts fetch the full list again; forget() drops the entries of a
+    removed account.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self.entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, key: tuple) -> tuple:
+        """Returns (validators, body) for the key, or None."""
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+        return entry
+
+    @staticmethod
+    def validators(response: ApiResponse) -> dict:
+        """Conditional request headers for a cached response."""
+        headers = {}
+        if "ETag" in response.headers:
+            headers["If-None-Match"] = response.headers["ETag"]
+        if "Last-Modified" in response.headers:
+            headers["If-Modified-Since"] = response.headers["Last-Modified"]
+        return headers
+
+    def put(self, key: tuple, response: ApiResponse, body) -> None:
+        """
+        Stores the decoded body of a 200 response if it has validators,
+        otherwise forgets the key.
+        """
+        validators = self.validators(response)
+        if not validators or body is None:
+            self.entries.pop(key, None)
+            return
+        self.entries[key] = (validators, body)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def forget(self, account: str) -> None:
+        """Drops every entry of an account."""
+        for key in [key for key in self.entries if key[0] == account]:
+            del self.entries[key]
+
+
+class Scheduler:
+    """
+    Priority queue of accounts keyed on the time they next have work.
+
+    Entries are (deadline, seq, item) tuples on a heap, with deadlines as
+    unix timestamps. Workers block in next_due() until the earliest deadline
+    has passed; schedule() wakes them so a newly added earlier deadline is
+    picked up without polling.
+
+    pace, if given, is called as pace(item, now) for every due item before
+    it is handed out. It returns None to let the item go, or the time the
+    item has to wait until; the item is then put back at that time and the
+    next due item is tried, so a paced item never holds a worker.
+    """
+
+    def __init__(self, pace=None):
+        self._heap = []
+        self._seq = itertools.count()
+        self._changed = asyncio.Event()
+        self._pace = pace
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def schedule(self, item, when: float) -> None:
+        heapq.heappush(self._heap, (when, next(self._seq), item))
+        self._changed.set()
+
+    def reschedule(self, item, when: float) -> bool:
+        """Moves a queued item to a new deadline. Returns False if not queued."""
+        for position, (_, seq, queued) in enumerate(self._heap):
+            if queued is item:
+                self._heap[position] = (when, seq, item)
+                heapq.heapify(self._heap)
+                self._changed.set()
+                return True
+        return False
+
+    def due_count(self) -> int:
+        now = time.time()
+        return sum(1 for when, _, _ in self._heap if when <= now)
+
+    def next_deadline(self) -> float:
+        """Earliest scheduled deadline, or None when nothing is queued."""
+        return self._heap[0][0] if self._heap else None
+
+    async def next_due(self):
+        """Waits until the earliest deadline has passed and pops its item."""
+        while True:
+            delay = None
+            while self._heap:
+                now = time.time()
+                delay = self._heap[0][0] - now
+                if delay > 0:
+                    break
+                when, seq, item = heapq.heappop(self._heap)
+                not_before = self._pace(item, now) if self._pace else None
+                if not_before is None:
+                    return item
+                heapq.heappush(self._heap, (not_before, seq, item))
+            self._changed.clear()
+            try:
+                await asyncio.wait_for(self._changed.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+
+class AccountContext:
+    """
+    Per-account client state.
+
+    One context is built for every account a worker picks up, so concurrent
+    workers never share a token, auth headers or proxy. The wagmihub instance
+    itself only carries configuration that does not change during a run, plus
+    the session pool, which hands out the pooled session for the account proxy.
+    """
+
+    __slots__ = (
+        "index",
+        "key",
+        "label",
+        "token",
+        "headers",
+        "proxy",
+        "gamedata",
+        "gamedata_at",
+        "crack_time",
+        "daily_claimed",
+        "daily_checked_at",
+        "mining_claimed_at",
+        "ticket_count",
+        "balance",
+        "tasks_checked_at",
+        "completed_tasks",
+        "pending_bets",
+        "cycles",
+        "login_failures",
+        "quarantined_until",
+        "quarantine_checksum",
+        "login_lock",
+        "stalls",
+    )
+
+    def __init__(self, index: int, key: str, label: str, proxy: str = None):
+        self.index = index
+        # Query string dibaca ulang dari AccountSource saat login
+        self.key = key
+        self.label = label
+        self.token = None
+        self.headers = wagmihub.HEADERS
+        self.proxy = proxy
+        self.gamedata = None
+        self.gamedata_at = 0.0
+        # Last known values, kept across cycles for the scheduler
+        self.crack_time = None
+        self.daily_claimed = None
+        self.daily_checked_at = None
+        self.mining_claimed_at = None
+        self.ticket_count = 0
+        self.balance = 0
+        self.tasks_checked_at = None
+        self.completed_tasks = set()
+        # Bet checks still waiting for their result (asyncio tasks)
+        self.pending_bets = set()
+        self.cycles = 0
+        # Login ditolak berturut-turut; akun dikarantina sampai quarantined_until
+        self.login_failures = 0
+        self.quarantined_until = None
+        self.quarantine_checksum = None
+        # Satu login ulang per akun saat beberapa request kena 401 bersamaan
+        self.login_lock = asyncio.Lock()
+        # Putaran berturut-turut tiap fase masih jatuh tempo setelah dijalankan
+        self.stalls = {}
+
+    def restore(self, state: dict) -> None:
+        """Loads the values saved by StateStore in a previous cycle or run."""
+        for field in StateStore.FIELDS:
+            if state.get(field) is not None:
+                setattr(self, field, state[field])
+        self.completed_tasks = state.get("completed_tasks", set())
+
+    @property
+    def quarantined(self) -> bool:
+        """True while the account waits out a rejected login."""
+        return (
+            self.quarantined_until is not None and self.quarantined_until > time.time()
+        )
+
+    @property
+    def known(self) -> bool:
+        """True once the scheduler fields are known without a new fetch."""
+        return self.crack_time is not None and self.daily_claimed is not None
+
+    def daily_done(self) -> bool:
+        """True if the daily reward is known to be claimed for the current UTC day."""
+        if not self.daily_claimed or not self.daily_checked_at:
+            return False
+        midnight = datetime.now(timezone.utc).replace(
+            hour=0, minute=0, second=0, microsecond=0
+        )
+        return self.daily_checked_at >= midnight.timestamp()
+
+    def set_token(self, token: str) -> None:
+        """Stores the access token and prebuilds the authorized headers."""
+        self.token = token
+        self.headers = {**wagmihub.HEADERS, "authorization": f"Bearer {token}"}
+
+    def clear_token(self) -> None:
+        self.token = None
+        self.headers = wagmihub.HEADERS
+
+    def set_gamedata(self, message: dict) -> None:
+        """
+        Stores a fresh game/mining/gamedata snapshot.
+
+        Raises:
+            ValueError: If the message is not an object; nothing is stored.
+        """
+        if not isinstance(message, dict):
+            raise ValueError(f"game data is {type(message).__name__}, not an object")
+        self.gamedata = message
+        self.gamedata_at = time.monotonic()
+        self._track(message)
+
+    def _track(self, message: dict) -> None:
+        """Remembers the fields the scheduler derives deadlines from."""
+        mining_data = message.get("miningData") or {}
+        if mining_data.get("crackTime") is not None:
+            self.crack_time = mining_data["crackTime"]
+        daily_data = message.get("dailyRewardsData") or {}
+        if daily_data.get("isClaimed") is not None:
+            self.daily_claimed = daily_data["isClaimed"]
+            self.daily_checked_at = time.time()
+        if "ticketCount" in message:
+            self.ticket_count = message["ticketCount"] or 0
+        user_data = message.get("userData") or {}
+        if "balance" in user_data:
+            try:
+                self.balance = int(user_data["balance"])
+            except (TypeError, ValueError):
+                self.balance = 0
+
+    def merge_gamedata(self, message: dict) -> None:
+        """
+        Folds the miningData/userData/ticketCount carried by a claim or bet
+        response into the current snapshot, if there is one. The tracked
+        fields are updated either way.
+        """
+        if not isinstance(message, dict):
+            return
+        self._track(message)
+        if self.gamedata is None:
+            return
+        for key in ("miningData", "userData"):
+            if isinstance(message.get(key), dict):
+                self.gamedata[key] = {**self.gamedata.get(key, {}), **message[key]}
+        if "ticketCount" in message:
+            self.gamedata["ticketCount"] = message["ticketCount"]
+
+    def invalidate_gamedata(self) -> None:
+        """Drops the snapshot so the next read fetches it again."""
+        self.gamedata = None
+
+
+class BetLedger:
+    """
+    Tickets and balance left for bets during one game() run.
+
+    Starts from a game data snapshot and is updated locally for every bet
+    placed, so game() does not fetch game data before each bet. Values the
+    server reports in place-bet and check-bet responses replace the local
+    ones; a reported value that differs from the expected one is a mismatch,
+    after which game() reconciles with a fresh snapshot. Bets whose response
+    did not report the ticket count are counted in unconfirmed.
+    """
+
+    __slots__ = ("bet_amount", "tickets", "balance", "placed", "unconfirmed")
+
+    def __init__(self, bet_amount: int, tickets: int = 0, balance: int = 0):
+        self.bet_amount = bet_amount
+        self.tickets = tickets
+        self.balance = balance
+        self.placed = 0
+        self.unconfirmed = 0
+
+    @staticmethod
+    def _reported(message: dict) -> tuple:
+        """(ticketCount, balance) found in a response message, None if absent."""
+        tickets = balance = None
+        if message.get("ticketCount") is not None:
+            try:
+                tickets = int(message["ticketCount"])
+            except (TypeError, ValueError):
+                pass
+        user_data = message.get("userData") or {}
+        if user_data.get("balance") is not None:
+            try:
+                balance = int(user_data["balance"])
+            except (TypeError, ValueError):
+                pass
+        return tickets, balance
+
+    @property
+    def budget(self) -> int:
+        """Bets that can still be placed: min(tickets, balance // bet_amount)."""
+        return max(0, min(self.tickets, self.balance // self.bet_amount))
+
+    def reconcile(self, message: dict) -> bool:
+        """
+        Takes ticketCount and balance from a game data snapshot.
+
+        Returns:
+            bool: True if the ledger had drifted from the server.
+        """
+        tickets, balance = self._reported(message)
+        tickets = tickets if tickets is not None else 0
+        balance = balance if balance is not None else 0
+        drifted = (tickets, balance) != (self.tickets, self.balance)
+        self.tickets, self.balance = tickets, balance
+        self.unconfirmed = 0
+        return drifted
+
+    def spend(self, message: dict) -> bool:
+        """
+        Books a placed bet, then applies what place-bet reported.
+
+        Returns:
+            bool: False on a mismatch with the reported values.
+        """
+        self.placed += 1
+        self.tickets -= 1
+        self.balance -= self.bet_amount
+        tickets, balance = self._reported(message)
+        consistent = True
+        if tickets is not None:
+            consistent = tickets == self.tickets
+            self.tickets = tickets
+        else:
+            self.unconfirmed += 1
+        if balance is not None:
+            consistent = consistent and balance == self.balance
+            self.balance = balance
+        return consistent
+
+    def settle(self, message: dict) -> None:
+        """Applies the values a check-bet response reports, e.g. after a win."""
+        tickets, balance = self._reported(message)
+        if tickets is not None:
+            self.tickets = tickets
+        if balance is not None:
+            self.balance = balance
 
 
 class wagmihub:
@@ -34,19 +1729,75 @@ class wagmihub:
         "user-agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/134.0.0.0 Safari/537.36 Edg/134.0.0.0",
         "Referrer-Policy": "strict-origin-when-cross-origin",
     }
-
-    def __init__(self):
-        self.query_list = self.load_query("query.txt")
-        self.token = None
-        self.config = self.load_config()
-        self.session = self.sessions()
-        self._original_requests = {
-            "get": requests.get,
-            "post": requests.post,
-            "put": requests.put,
-            "delete": requests.delete,
-        }
-        self.proxy_session = None
+    BET_AMOUNT = 30000
+    RETRY_STATUSES = (500, 502, 503, 504, 520)
+    RETRY_TOTAL = 3
+    RETRY_BACKOFF = 1
+
+    def __init__(
+        self,
+        shard_index: int = 0,
+        shard_count: int = 1,
+        cassette: Cassette = None,
+        config: dict = None,
+    ):
+        self.logger = AsyncLogger()
+        self.shard_index = shard_index
+        self.shard_count = shard_count
+        self.cassette = cassette
+        self.banner()
+        # Config yang sudah dibaca (mis. oleh supervisor) tidak dibaca ulang
+        self.config = self.load_config() if config is None else config
+        self.logger.set_level(self.config.get("log_level", "info"))
+        STARTUP.mark("config.json" if config is None else "process start")
+        self.accounts = self.load_query("query.txt")
+        STARTUP.mark("query.txt index")
+        # Arahkan ke server lain (mis. mock_server.py untuk benchmark)
+        base_url = self.config.get("base_url")
+        if base_url:
+            self.BASE_URL = base_url.rstrip("/") + "/"
+        # Rekam/putar ulang selalu mulai dari nol: tanpa token dan state
+        # tersimpan, supaya urutan request sama setiap kali
+        fresh = cassette is not None
+        if fresh:
+            cassette.base_url = self.BASE_URL
+        self.tokens = TokenCache(
+            (
+                None
+                if fresh
+                else self.shard_path(self.config.get("token_cache", "tokens.json"))
+            ),
+            default_ttl=self.config.get("token_ttl", 3600),
+        )
+        cached = self.tokens.load()
+        if cached:
+            self.log(f"🔑 Loaded {cached} cached access tokens.", Fore.GREEN)
+        STARTUP.mark("token cache")
+        self.state = StateStore(
+            ":memory:"
+            if fresh
+            else self.shard_path(self.config.get("state_db", "state.db"))
+        )
+        STARTUP.mark("state database")
+        self.limiter = RateLimiter(self.BASE_URL, self.config.get("rate_limit", {}))
+        self.metrics = Metrics()
+        self.concurrency = ConcurrencyController.from_config(self.config)
+        self.responses = ResponseCache(self.config.get("response_cache_size", 1024))
+        # aiohttp sessions must be created inside the running event loop,
+        # so main() opens the pool with sessions() before any worker starts.
+        self.pool = None
+        self.proxies = None
+        self.in_progress = 0
+        # AccountContext per account_key yang sedang dijadwalkan
+        self.contexts = {}
+        # Waktu paling awal akun berikutnya boleh mulai, per proxy
+        self.lanes = {}
+        # Semua task check_bet yang masih berjalan, dari semua akun
+        self.bet_checks = set()
+        # Di-set saat semua akun sudah menjalankan "max_cycles" putaran
+        # dan semua hasil bet sudah dicek
+        self.finished = asyncio.Event()
+        self.finishing = False
 
     def banner(self) -> None:
         """Displays the banner for the bot."""
@@ -54,24 +1805,206 @@ class wagmihub:
         self.log("🚀 Created by LIVEXORDS", Fore.CYAN)
         self.log("📢 Channel: t.me/livexordsscript\n", Fore.CYAN)
 
-    def log(self, message, color=Fore.RESET):
-        safe_message = message.encode("utf-8", "backslashreplace").decode("utf-8")
-        print(
-            Fore.LIGHTBLACK_EX
-            + datetime.now().strftime("[%Y:%m:%d ~ %H:%M:%S] |")
-            + " "
-            + color
-            + safe_message
-            + Fore.RESET
-        )
+    def log(self, message, color=Fore.RESET, level=INFO):
+        self.logger.log(message, color, level)
+
+    @property
+    def shard_label(self) -> str:
+        """e.g. "Shard-2/4", or "" when not sharded."""
+        if self.shard_count <= 1:
+            return ""
+        return f"Shard-{self.shard_index + 1}/{self.shard_count}"
+
+    def shard_path(self, path: str) -> str:
+        """
+        Gives each shard its own copy of a state file (tokens.json becomes
+        tokens.shard-2-of-4.json), so processes never write the same file.
+        """
+        if self.shard_count <= 1:
+            return path
+        root, ext = os.path.splitext(path)
+        return f"{root}.shard-{self.shard_index + 1}-of-{self.shard_count}{ext}"
+
+    def sessions(self) -> SessionPool:
+        """
+        Creates the keep-alive session pool shared by every API call.
 
-    def sessions(self):
-        session = requests.Session()
-        retries = Retry(
-            total=3, backoff_factor=1, status_forcelist=[500, 502, 503, 504, 520]
+        Must be called from inside the running event loop. The connection
+        limits come from "pool_size" (per proxy) and "pool_size_per_host".
+        Every call gets the default timeouts "connect_timeout" (connecting,
+        including the proxy), "read_timeout" (between two reads of the
+        response) and "request_timeout" (whole call, 0 = none).
+
+        Returns:
+            SessionPool: The pool used by request().
+        """
+        return SessionPool(
+            limit=self.config.get("pool_size", 100),
+            limit_per_host=self.config.get("pool_size_per_host", 20),
+            timeout=aiohttp.ClientTimeout(
+                total=self.config.get("request_timeout", 60) or None,
+                connect=self.config.get("connect_timeout", 10) or None,
+                sock_read=self.config.get("read_timeout", 30) or None,
+            ),
         )
-        session.mount("https://", HTTPAdapter(max_retries=retries))
-        return session
+
+    async def request(
+        self,
+        method: str,
+        url: str,
+        ctx: AccountContext = None,
+        headers: dict = None,
+        data=None,
+        proxy: str = None,
+        timeout: float = None,
+        retries: int = None,
+        conditional: bool = False,
+    ) -> ApiResponse:
+        """
+        Sends an HTTP request on the event loop and buffers the response.
+
+        Responses with a status in RETRY_STATUSES are retried with exponential
+        backoff, the same policy the old requests adapter was configured with.
+        When an account call made with the account headers gets a 401, the
+        cached token is dropped, the account logs in again and the call is
+        sent once more with the new token. Only one call per account logs in;
+        concurrent calls that got the same 401 wait for it and reuse the new
+        token. Conditional GETs revalidate the
+        response kept in the response cache and return it on a 304.
+
+        Args:
+            method (str): HTTP method, e.g. "GET" or "POST".
+            url (str): Absolute URL to call.
+            ctx (AccountContext): Account whose headers and proxy are used.
+            headers (dict): Request headers. Defaults to the account headers.
+            data: Request body.
+            proxy (str): Proxy URL. Defaults to the account proxy, if any.
+            timeout (float): Total timeout in seconds for this call.
+            retries (int): Retry budget for server errors. Defaults to RETRY_TOTAL.
+            conditional (bool): Use ETag/Last-Modified revalidation (GET only).
+
+        Returns:
+            ApiResponse: The buffered response.
+        """
+        if retries is None:
+            retries = self.RETRY_TOTAL
+        reauth = ctx is not None and headers is None and ctx.token is not None
+        sent_token = ctx.token if reauth else None
+        if ctx is not None:
+            headers = ctx.headers if headers is None else headers
+            proxy = proxy or ctx.proxy
+
+        cache_key = cached = None
+        if conditional and method == "GET" and self.responses.max_entries > 0:
+            cache_key = (ctx.key if ctx is not None else None, url)
+            cached = self.responses.get(cache_key)
+            if cached is not None:
+                headers = {**(headers or {}), **cached[0]}
+        kwargs = {"headers": headers, "data": data, "proxy": proxy}
+        if timeout is not None:
+            kwargs["timeout"] = aiohttp.ClientTimeout(total=timeout)
+
+        account = ctx.key if ctx is not None else None
+        try:
+            response = await self._send(method, url, retries, kwargs, account)
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+            # Gagal koneksi lewat proxy akun dihitung ke circuit breaker
+            if ctx is not None and proxy and self.proxies is not None:
+                self.proxies.record(proxy, False)
+            raise
+        if ctx is not None and proxy and self.proxies is not None:
+            self.proxies.record(proxy, True)
+        if response.status == 401 and reauth:
+            async with ctx.login_lock:
+                if ctx.token != sent_token:
+                    # Call lain sudah login ulang (atau gagal); jangan login lagi
+                    relogged = ctx.token is not None
+                else:
+                    self.log(
+                        "🔑 Access token rejected (401). Logging in again...",
+                        Fore.YELLOW,
+                    )
+                    self.tokens.drop(ctx.key)
+                    ctx.clear_token()
+                    relogged = await self.authenticate(ctx)
+            if relogged:
+                kwargs["headers"] = ctx.headers
+                if cached is not None:
+                    kwargs["headers"] = {**ctx.headers, **cached[0]}
+                response = await self._send(method, url, retries, kwargs, account)
+
+        if cache_key is not None:
+            if response.status == 304 and cached is not None:
+                self.responses.hits += 1
+                self.metrics.inc("wagmi_response_cache_hits_total")
+                # Body 304 kosong; pakai body yang sudah di-decode dari cache
+                response.cached = True
+                response.decoded = cached[1]
+                return response
+            self.responses.misses += 1
+            if response.status == 200:
+                self.responses.put(cache_key, response, self.decode_response(response))
+        return response
+
+    async def _send(
+        self, method: str, url: str, retries: int, kwargs: dict, account: str = None
+    ):
+        cassette = self.cassette
+        replaying = cassette is not None and cassette.replaying
+        session = None if replaying else self.pool.get(kwargs["proxy"])
+        endpoint = self.limiter.endpoint(url)
+        data = kwargs.get("data")
+        sent = len(data) if isinstance(data, (str, bytes)) else 0
+        attempt = 0
+        while True:
+            if endpoint is not None:
+                await self.limiter.acquire(endpoint)
+            if STARTUP.enabled and not STARTUP.done:
+                for line in STARTUP.report():
+                    self.log(line, Fore.MAGENTA)
+            start = time.monotonic()
+            try:
+                if replaying:
+                    response = await cassette.play(method, url, account)
+                else:
+                    async with session.request(method, url, **kwargs) as raw:
+                        response = ApiResponse(raw, await raw.read())
+                    if cassette is not None:
+                        cassette.record(
+                            method, url, account, response, time.monotonic() - start
+                        )
+            except Exception:
+                if endpoint is not None:
+                    elapsed = time.monotonic() - start
+                    self.metrics.observe_request(endpoint, "error", elapsed, 0, sent)
+                    self.concurrency.observe(elapsed, False)
+                raise
+
+            if endpoint is not None:
+                elapsed = time.monotonic() - start
+                self.metrics.observe_request(
+                    endpoint, response.status, elapsed, len(response.content), sent
+                )
+                self.concurrency.observe(
+                    elapsed, response.status < 500 and response.status != 429
+                )
+                pause = self.limiter.on_response(
+                    endpoint, response.status, response.headers.get("Retry-After")
+                )
+                if pause is not None:
+                    self.log(
+                        f"🚦 Rate limited (429) on {endpoint}. Pausing {pause:.1f}s and slowing down.",
+                        Fore.YELLOW,
+                    )
+                    if attempt < retries:
+                        # Jeda sudah diatur limiter, acquire() berikutnya menunggu
+                        attempt += 1
+                        continue
+
+            if response.status not in self.RETRY_STATUSES or attempt >= retries:
+                return response
+            await asyncio.sleep(self.RETRY_BACKOFF * (2**attempt))
+            attempt += 1
 
     def load_config(self) -> dict:
         """
@@ -95,81 +2028,173 @@ class wagmihub:
             )
             return {}
 
-    def load_query(self, path_file: str = "query.txt") -> list:
+    def load_query(self, path_file: str = "query.txt") -> AccountSource:
         """
-        Loads a list of queries from the specified file.
+        Indexes the queries in the specified file.
 
         Args:
             path_file (str): The path to the query file. Defaults to "query.txt".
 
         Returns:
-            list: A list of queries or an empty list if an error occurs.
+            AccountSource: The account index; empty if an error occurs.
         """
-        self.banner()
-
+        accounts = AccountSource(path_file)
         try:
-            with open(path_file, "r") as file:
-                queries = [line.strip() for line in file if line.strip()]
+            accounts.refresh()
+            # Akun awal dijadwalkan oleh main(), bukan oleh watch_accounts
+            accounts.take_changes()
 
-            if not queries:
+            if not len(accounts):
                 self.log(f"⚠️ Warning: {path_file} is empty.", Fore.YELLOW)
 
-            self.log(f"✅ Loaded {len(queries)} queries from {path_file}.", Fore.GREEN)
-            return queries
+            self.log(f"✅ Loaded {len(accounts)} queries from {path_file}.", Fore.GREEN)
 
         except FileNotFoundError:
             self.log(f"❌ File not found: {path_file}", Fore.RED)
-            return []
         except Exception as e:
             self.log(f"❌ Unexpected error loading queries: {e}", Fore.RED)
-            return []
+        return accounts
+
+    def add_account(self, scheduler: Scheduler, key: str, when: float) -> None:
+        """Schedules an account unless it is already queued."""
+        if key in self.contexts:
+            return
+        # Nomor urut sesuai baris di query.txt saat akun ditambahkan
+        idx = self.accounts.line_number(key)
+        ctx = AccountContext(idx, key, f"Account-{idx+1}")
+        # Lanjutkan dari state run sebelumnya jika ada
+        state = self.state.load(key)
+        if state is not None:
+            ctx.restore(state)
+            if ctx.quarantine_checksum not in (None, self.accounts.checksum(key)):
+                # initData diganti sejak dikarantina: coba login lagi
+                self.release(ctx)
+            deadlines = self.deadlines(ctx, when)
+            if ctx.quarantined:
+                when = ctx.quarantined_until
+            elif deadlines:
+                when = max(when, min(deadlines.values()))
+        self.contexts[key] = ctx
+        scheduler.schedule(ctx, when)
+
+    def in_shard(self, key: str) -> bool:
+        return (
+            self.shard_count <= 1 or shard_of(key, self.shard_count) == self.shard_index
+        )
+
+    def quarantine(self, ctx: AccountContext, reason: str) -> None:
+        """
+        Parks an account whose login was rejected.
+
+        The account is retried after "quarantine_delay" seconds, doubling on
+        every further rejection up to "quarantine_max_delay". Editing its line
+        in query.txt releases it right away.
+        """
+        ctx.login_failures += 1
+        delay = min(
+            self.config.get("quarantine_delay", 600) * 2 ** (ctx.login_failures - 1),
+            self.config.get("quarantine_max_delay", 86400),
+        )
+        ctx.quarantined_until = time.time() + delay
+        ctx.quarantine_checksum = self.accounts.checksum(ctx.key)
+        self.metrics.inc("wagmi_login_failures_total", reason="rejected")
+        self.log(
+            f"🚫 Login rejected ({reason}), quarantined for {Fore.WHITE}{int(delay)}{Fore.RED} seconds "
+            f"(failure {ctx.login_failures}).",
+            Fore.RED,
+        )
+
+    def release(self, ctx: AccountContext) -> None:
+        ctx.login_failures = 0
+        ctx.quarantined_until = None
+        ctx.quarantine_checksum = None
 
-    def decode_response(self, response):
+    def pace(self, ctx: AccountContext, now: float):
+        """
+        Spaces out account starts on the same egress (Scheduler pace hook).
+
+        Accounts sharing a proxy start at least "delay_account_switch"
+        seconds apart. The direct connection carries every account that has
+        no proxy, so it gets one start per delay for each concurrency slot,
+        the rate the old per-worker sleep allowed. Each gap is stretched or
+        shrunk at random by up to "account_switch_jitter" of its length.
+
+        Returns:
+            float: Time the account has to wait until, or None if it can
+            start now (the next start on its lane is then pushed back).
+        """
+        delay = self.config.get("delay_account_switch", 10)
+        if delay <= 0:
+            return None
+        if self.proxies is not None:
+            ctx.proxy = self.proxies.assign(ctx.key)
+        lane = ctx.proxy
+        if lane is None:
+            delay /= self.concurrency.limit
+        not_before = self.lanes.get(lane, 0)
+        if not_before > now:
+            return not_before
+        jitter = self.config.get("account_switch_jitter", 0.2)
+        self.lanes[lane] = now + delay * random.uniform(1 - jitter, 1 + jitter)
+        return None
+
+    def quarantined_count(self) -> int:
+        return sum(1 for ctx in self.contexts.values() if ctx.quarantined)
+
+    @staticmethod
+    def decode_response(response):
         """
         Mendekode response dari server secara umum.
 
+        Body sudah didekompresi oleh aiohttp, jadi tidak ada dekompresi ulang.
+        Response JSON langsung di-parse dari bytes (memakai orjson jika
+        terpasang); decode charset dan chardet hanya dipakai sebagai fallback.
+
         Parameter:
-            response: objek requests.Response
+            response: objek ApiResponse
 
         Mengembalikan:
             - Jika Content-Type mengandung 'application/json', maka mengembalikan objek Python (dict atau list) hasil parsing JSON.
             - Jika bukan JSON, maka mengembalikan string hasil decode.
         """
-        # Ambil header
-        content_encoding = response.headers.get("Content-Encoding", "").lower()
+        # Response dari cache (304) sudah pernah di-parse
+        decoded = getattr(response, "decoded", None)
+        if decoded is not None:
+            return decoded
+
         content_type = response.headers.get("Content-Type", "").lower()
+        data = response.content
+
+        # Fast path: parse JSON langsung dari bytes
+        is_json = "application/json" in content_type
+        if is_json:
+            try:
+                decoded = json_loads(data)
+            except ValueError:
+                pass
+            else:
+                if isinstance(response, ApiResponse):
+                    response.decoded = decoded
+                return decoded
 
         # Tentukan charset dari Content-Type, default ke utf-8
         charset = "utf-8"
         if "charset=" in content_type:
             charset = content_type.split("charset=")[-1].split(";")[0].strip()
 
-        # Ambil data mentah
-        data = response.content
-
-        # Dekompresi jika perlu
-        try:
-            if content_encoding == "gzip":
-                data = gzip.decompress(data)
-            elif content_encoding in ["br", "brotli"]:
-                data = brotli.decompress(data)
-            elif content_encoding in ["deflate", "zlib"]:
-                data = zlib.decompress(data)
-        except Exception:
-            # Jika dekompresi gagal, lanjutkan dengan data asli
-            pass
-
         # Coba decode menggunakan charset yang didapat
         try:
             text = data.decode(charset)
         except Exception:
             # Fallback: deteksi encoding dengan chardet
+            import chardet
+
             detection = chardet.detect(data)
-            detected_encoding = detection.get("encoding", "utf-8")
+            detected_encoding = detection.get("encoding") or "utf-8"
             text = data.decode(detected_encoding, errors="replace")
 
         # Jika konten berupa JSON, kembalikan hasil parsing JSON
-        if "application/json" in content_type:
+        if is_json:
             try:
                 return json.loads(text)
             except Exception:
@@ -178,13 +2203,73 @@ class wagmihub:
         else:
             return text
 
-    def login(self, index: int) -> None:
-        self.log("🔐 Attempting to log in...", Fore.GREEN)
-        if index >= len(self.query_list):
-            self.log("❌ Invalid login index. Please check again.", Fore.RED)
-            return
+    async def get_gamedata(self, ctx: AccountContext, force: bool = False) -> dict:
+        """
+        Returns the account's game/mining/gamedata snapshot.
+
+        The snapshot kept on the context is reused while it is younger than
+        "gamedata_ttl" seconds, so login, daily, farming and game share one
+        fetch per cycle.
+
+        Args:
+            ctx (AccountContext): The account to read game data for.
+            force (bool): Ignore the cached snapshot and fetch it again.
+
+        Returns:
+            dict: The "message" part of the game data, or None if the request failed.
+        """
+        ttl = self.config.get("gamedata_ttl", 30)
+        if (
+            not force
+            and ctx.gamedata is not None
+            and time.monotonic() - ctx.gamedata_at < ttl
+        ):
+            self.log("📦 Using cached game data.", Fore.CYAN)
+            return ctx.gamedata
+
+        # API: game/mining/gamedata (GET)
+        gamedata_url = f"{self.BASE_URL}game/mining/gamedata"
+        try:
+            self.log("📡 Fetching game data...", Fore.CYAN)
+            gamedata_response = await self.request("GET", gamedata_url, ctx)
+            gamedata_response.raise_for_status()
+            gamedata = self.decode_response(gamedata_response)
+            ctx.set_gamedata(gamedata.get("message", {}))
+        except aiohttp.ClientError as e:
+            self.log(f"❌ Failed to fetch game data: {e}", Fore.RED)
+            try:
+                self.log(f"📄 Response content: {gamedata_response.text}", Fore.RED)
+            except Exception:
+                pass
+            return None
+        except Exception as e:
+            self.log(f"❌ Unexpected error in game data request: {e}", Fore.RED)
+            try:
+                self.log(f"📄 Response content: {gamedata_response.text}", Fore.RED)
+            except Exception:
+                pass
+            return None
+        return ctx.gamedata
+
+    async def authenticate(self, ctx: AccountContext) -> bool:
+        """
+        Exchanges the account's initData for an access token.
+
+        The token is stored on the context and in the token cache. A login
+        the server rejects (4xx other than 408/429, or no accessToken in the
+        response) puts the account in quarantine(); network errors and 5xx
+        are left to the normal retry on the next cycle.
+
+        Args:
+            ctx (AccountContext): The account to log in.
 
-        token = self.query_list[index]
+        Returns:
+            bool: True if an access token was received.
+        """
+        token = self.accounts.query(ctx.key)
+        if token is None:
+            self.log("❌ Account is no longer in query.txt.", Fore.RED)
+            return False
         self.log(f"📋 Using token: {token[:10]}... (truncated for security)", Fore.CYAN)
 
         # API: game/initdata (POST) menggunakan self.HEADERS
@@ -192,140 +2277,184 @@ class wagmihub:
         payload = json.dumps({"initData": token})
         try:
             self.log("📡 Sending init data request...", Fore.CYAN)
-            initdata_response = requests.post(
-                initdata_url, headers=self.HEADERS, data=payload
+            initdata_response = await self.request(
+                "POST", initdata_url, ctx, headers=self.HEADERS, data=payload
             )
             initdata_response.raise_for_status()
             initdata = self.decode_response(initdata_response)
-        except requests.exceptions.RequestException as e:
+        except aiohttp.ClientError as e:
             self.log(f"❌ Failed to send init data request: {e}", Fore.RED)
             try:
                 self.log(f"📄 Response content: {initdata_response.text}", Fore.RED)
             except Exception:
                 pass
-            return
+            if self.login_rejected(e):
+                self.quarantine(ctx, f"HTTP {e.status}")
+            else:
+                self.metrics.inc("wagmi_login_failures_total", reason="transient")
+            return False
         except Exception as e:
             self.log(f"❌ Unexpected error during init data request: {e}", Fore.RED)
             try:
                 self.log(f"📄 Response content: {initdata_response.text}", Fore.RED)
             except Exception:
                 pass
-            return
+            self.metrics.inc("wagmi_login_failures_total", reason="transient")
+            return False
 
-        # Simpan accessToken dari response ke self.token
+        # Simpan accessToken dari response ke context akun
         try:
             access_token = initdata.get("message", {}).get("accessToken", "")
             if not access_token:
                 self.log("❌ No access token received.", Fore.RED)
-                return
-            self.token = access_token
+                self.quarantine(ctx, "no access token")
+                return False
+            ctx.set_token(access_token)
+            self.tokens.put(ctx.key, access_token)
+            self.release(ctx)
             self.log("✅ Init data successful! Access token saved.", Fore.GREEN)
         except Exception as e:
             self.log(f"❌ Error processing init data response: {e}", Fore.RED)
-            return
+            return False
+        return True
 
-        # API: game/mining/gamedata (GET)
-        gamedata_url = f"{self.BASE_URL}game/mining/gamedata"
-        gamedata_headers = {**self.HEADERS, "authorization": f"Bearer {self.token}"}
-        try:
-            self.log("📡 Sending game data request...", Fore.CYAN)
-            gamedata_response = requests.get(gamedata_url, headers=gamedata_headers)
-            gamedata_response.raise_for_status()
-            gamedata = self.decode_response(gamedata_response)
-        except requests.exceptions.RequestException as e:
-            self.log(f"❌ Failed to fetch game data: {e}", Fore.RED)
-            try:
-                self.log(f"📄 Response content: {gamedata_response.text}", Fore.RED)
-            except Exception:
-                pass
-            return
-        except Exception as e:
-            self.log(f"❌ Unexpected error in game data request: {e}", Fore.RED)
-            try:
-                self.log(f"📄 Response content: {gamedata_response.text}", Fore.RED)
-            except Exception:
-                pass
-            return
+    @staticmethod
+    def login_rejected(error: Exception) -> bool:
+        """True if initdata failed because the server refused the initData."""
+        status = getattr(error, "status", None)
+        return status is not None and 400 <= status < 500 and status not in (408, 429)
+
+    async def login(self, ctx: AccountContext) -> bool:
+        """
+        Logs the account in and loads its game data.
+
+        Returns:
+            bool: True if the account has a token and the phases can run.
+        """
+        self.log("🔐 Attempting to log in...", Fore.GREEN)
+
+        # Pakai access token dari cache selama belum expired
+        cached_token = self.tokens.get(ctx.key)
+        if cached_token:
+            ctx.set_token(cached_token)
+            self.log("🔑 Using cached access token.", Fore.GREEN)
+            if ctx.known:
+                # State tersimpan cukup; fase yang butuh game data akan fetch sendiri
+                self.log("💾 Using stored account state.", Fore.GREEN)
+                return True
+        elif not await self.authenticate(ctx):
+            return False
+
+        # Snapshot game data dipakai ulang oleh daily, farming dan game
+        message = await self.get_gamedata(ctx, force=True)
+        if message is None:
+            return False
 
         # Tampilin data penting dari response game data
         try:
-            message = gamedata.get("message", {})
             miningData = message.get("miningData", {})
             userData = message.get("userData", {})
             squadData = message.get("squadData", {})
 
-            self.log("🎮 Game Data:", Fore.GREEN)
+            self.log("🎮 Game Data:", Fore.GREEN, level=DEBUG)
 
-            self.log("Mining Data:", Fore.GREEN)
+            self.log("Mining Data:", Fore.GREEN, level=DEBUG)
             self.log(
                 f"    - Last Claim Time: {miningData.get('lastClaimTime', 'N/A')}",
                 Fore.CYAN,
+                level=DEBUG,
             )
             self.log(
-                f"    - Mining Rate: {miningData.get('miningRate', 'N/A')}", Fore.CYAN
+                f"    - Mining Rate: {miningData.get('miningRate', 'N/A')}",
+                Fore.CYAN,
+                level=DEBUG,
             )
             self.log(
-                f"    - Crack Time: {miningData.get('crackTime', 'N/A')}", Fore.CYAN
+                f"    - Crack Time: {miningData.get('crackTime', 'N/A')}",
+                Fore.CYAN,
+                level=DEBUG,
             )
 
-            self.log("User Data:", Fore.GREEN)
-            self.log(f"    - Balance: {userData.get('balance', 'N/A')}", Fore.CYAN)
-            self.log(f"    - All Points: {userData.get('allPoints', 'N/A')}", Fore.CYAN)
-            self.log(f"    - Tokens: {userData.get('tokens', 'N/A')}", Fore.CYAN)
-            self.log(f"    - Country: {userData.get('country', 'N/A')}", Fore.CYAN)
-            self.log(f"    - Created At: {userData.get('createdAt', 'N/A')}", Fore.CYAN)
+            self.log("User Data:", Fore.GREEN, level=DEBUG)
+            self.log(
+                f"    - Balance: {userData.get('balance', 'N/A')}",
+                Fore.CYAN,
+                level=DEBUG,
+            )
+            self.log(
+                f"    - All Points: {userData.get('allPoints', 'N/A')}",
+                Fore.CYAN,
+                level=DEBUG,
+            )
+            self.log(
+                f"    - Tokens: {userData.get('tokens', 'N/A')}", Fore.CYAN, level=DEBUG
+            )
+            self.log(
+                f"    - Country: {userData.get('country', 'N/A')}",
+                Fore.CYAN,
+                level=DEBUG,
+            )
+            self.log(
+                f"    - Created At: {userData.get('createdAt', 'N/A')}",
+                Fore.CYAN,
+                level=DEBUG,
+            )
 
-            self.log("Squad Data:", Fore.GREEN)
-            self.log(f"    - UUID: {squadData.get('uuid', 'N/A')}", Fore.CYAN)
-            self.log(f"    - Title: {squadData.get('title', 'N/A')}", Fore.CYAN)
-            self.log(f"    - Username: {squadData.get('username', 'N/A')}", Fore.CYAN)
-            self.log(f"    - Logo URL: {squadData.get('logoUrl', 'N/A')}", Fore.CYAN)
+            self.log("Squad Data:", Fore.GREEN, level=DEBUG)
+            self.log(
+                f"    - UUID: {squadData.get('uuid', 'N/A')}", Fore.CYAN, level=DEBUG
+            )
+            self.log(
+                f"    - Title: {squadData.get('title', 'N/A')}", Fore.CYAN, level=DEBUG
+            )
+            self.log(
+                f"    - Username: {squadData.get('username', 'N/A')}",
+                Fore.CYAN,
+                level=DEBUG,
+            )
+            self.log(
+                f"    - Logo URL: {squadData.get('logoUrl', 'N/A')}",
+                Fore.CYAN,
+                level=DEBUG,
+            )
             self.log(
                 f"    - Telegram Chat ID: {squadData.get('telegramChatId', 'N/A')}",
                 Fore.CYAN,
+                level=DEBUG,
             )
         except Exception as e:
             self.log(f"❌ Error processing game data response: {e}", Fore.RED)
+        return True
 
-    def farming(self) -> None:
+    async def farming(self, ctx: AccountContext) -> None:
         self.log("🌾 Starting farming process...", Fore.GREEN)
 
-        # Siapkan headers dengan tambahan authorization
-        headers = {**self.HEADERS, "authorization": f"Bearer {self.token}"}
-
-        # Request ke API: game/mining/gamedata
-        gamedata_url = f"{self.BASE_URL}game/mining/gamedata"
-        try:
-            self.log("📡 Fetching game data...", Fore.CYAN)
-            gamedata_response = requests.get(gamedata_url, headers=headers)
-            gamedata_response.raise_for_status()
-            gamedata = self.decode_response(gamedata_response)
-        except requests.exceptions.RequestException as e:
-            self.log(f"❌ Failed to fetch game data: {e}", Fore.RED)
-            try:
-                self.log(f"📄 Response content: {gamedata_response.text}", Fore.RED)
-            except Exception:
-                pass
+        # crackTime yang tersimpan belum lewat: tidak ada yang bisa di-claim
+        if ctx.crack_time is not None and time.time() < ctx.crack_time:
+            self.log(
+                f"⌛ Crack time not reached yet. Please wait {int(ctx.crack_time - time.time())} seconds.",
+                Fore.YELLOW,
+            )
             return
-        except Exception as e:
-            self.log(f"❌ Unexpected error in game data request: {e}", Fore.RED)
-            try:
-                self.log(f"📄 Response content: {gamedata_response.text}", Fore.RED)
-            except Exception:
-                pass
+
+        # Ambil snapshot game data (cache dari login jika masih segar)
+        gamedata = await self.get_gamedata(ctx)
+        if gamedata is None:
             return
 
         # Ambil miningData
         try:
-            miningData = gamedata.get("message", {}).get("miningData", {})
+            miningData = gamedata.get("miningData", {})
             last_claim_time = miningData.get("lastClaimTime", None)
             mining_rate = miningData.get("miningRate", "N/A")
             crack_time = miningData.get("crackTime", None)
 
-            self.log("🎮 Mining Data:", Fore.GREEN)
-            self.log(f"    - Last Claim Time: {last_claim_time}", Fore.CYAN)
-            self.log(f"    - Mining Rate: {mining_rate}", Fore.CYAN)
-            self.log(f"    - Crack Time: {crack_time}", Fore.CYAN)
+            self.log("🎮 Mining Data:", Fore.GREEN, level=DEBUG)
+            self.log(
+                f"    - Last Claim Time: {last_claim_time}", Fore.CYAN, level=DEBUG
+            )
+            self.log(f"    - Mining Rate: {mining_rate}", Fore.CYAN, level=DEBUG)
+            self.log(f"    - Crack Time: {crack_time}", Fore.CYAN, level=DEBUG)
 
             if crack_time is None:
                 self.log("❌ Crack time not found in the response.", Fore.RED)
@@ -335,8 +2464,6 @@ class wagmihub:
             return
 
         # Bandingkan crackTime dengan waktu user (current time)
-        import time
-
         current_time = int(time.time())
         self.log(f"⏰ Current time: {current_time}", Fore.CYAN)
 
@@ -348,10 +2475,10 @@ class wagmihub:
             # Request ke API: mining/claim
             claim_url = f"{self.BASE_URL}mining/claim"
             try:
-                claim_response = requests.get(claim_url, headers=headers)
+                claim_response = await self.request("GET", claim_url, ctx)
                 claim_response.raise_for_status()
                 claim_data = self.decode_response(claim_response)
-            except requests.exceptions.RequestException as e:
+            except aiohttp.ClientError as e:
                 self.log(f"❌ Failed to claim mining rewards: {e}", Fore.RED)
                 try:
                     self.log(f"📄 Response content: {claim_response.text}", Fore.RED)
@@ -369,29 +2496,44 @@ class wagmihub:
             # Tampilkan data claim yang penting
             try:
                 message = claim_data.get("message", {})
+                ctx.mining_claimed_at = time.time()
+                ctx.merge_gamedata(message)
                 new_miningData = message.get("miningData", {})
                 userData = message.get("userData", {})
 
                 self.log("🎉 Claim successful!", Fore.GREEN)
-                self.log("New Mining Data:", Fore.GREEN)
+                self.log("New Mining Data:", Fore.GREEN, level=DEBUG)
                 self.log(
                     f"    - Last Claim Time: {new_miningData.get('lastClaimTime', 'N/A')}",
                     Fore.CYAN,
+                    level=DEBUG,
                 )
                 self.log(
                     f"    - Mining Rate: {new_miningData.get('miningRate', 'N/A')}",
                     Fore.CYAN,
+                    level=DEBUG,
                 )
                 self.log(
                     f"    - Crack Time: {new_miningData.get('crackTime', 'N/A')}",
                     Fore.CYAN,
+                    level=DEBUG,
+                )
+                self.log("User Data:", Fore.GREEN, level=DEBUG)
+                self.log(
+                    f"    - Balance: {userData.get('balance', 'N/A')}",
+                    Fore.CYAN,
+                    level=DEBUG,
+                )
+                self.log(
+                    f"    - All Points: {userData.get('allPoints', 'N/A')}",
+                    Fore.CYAN,
+                    level=DEBUG,
                 )
-                self.log("User Data:", Fore.GREEN)
-                self.log(f"    - Balance: {userData.get('balance', 'N/A')}", Fore.CYAN)
                 self.log(
-                    f"    - All Points: {userData.get('allPoints', 'N/A')}", Fore.CYAN
+                    f"    - Tokens: {userData.get('tokens', 'N/A')}",
+                    Fore.CYAN,
+                    level=DEBUG,
                 )
-                self.log(f"    - Tokens: {userData.get('tokens', 'N/A')}", Fore.CYAN)
             except Exception as e:
                 self.log(f"❌ Error processing claim response: {e}", Fore.RED)
         else:
@@ -401,37 +2543,20 @@ class wagmihub:
                 Fore.YELLOW,
             )
 
-    def daily(self) -> None:
+    async def daily(self, ctx: AccountContext) -> None:
         self.log("🌞 Starting daily process...", Fore.GREEN)
 
-        # Siapkan headers dengan tambahan authorization
-        headers = {**self.HEADERS, "authorization": f"Bearer {self.token}"}
-
-        # Request ke API: game/mining/gamedata
-        gamedata_url = f"{self.BASE_URL}game/mining/gamedata"
-        try:
-            self.log("📡 Fetching game data for daily rewards...", Fore.CYAN)
-            gamedata_response = requests.get(gamedata_url, headers=headers)
-            gamedata_response.raise_for_status()
-            gamedata = self.decode_response(gamedata_response)
-        except requests.exceptions.RequestException as e:
-            self.log(f"❌ Failed to fetch game data: {e}", Fore.RED)
-            try:
-                self.log(f"📄 Response content: {gamedata_response.text}", Fore.RED)
-            except Exception:
-                pass
-            return
-        except Exception as e:
-            self.log(f"❌ Unexpected error in game data request: {e}", Fore.RED)
-            try:
-                self.log(f"📄 Response content: {gamedata_response.text}", Fore.RED)
-            except Exception:
-                pass
+        if ctx.daily_done():
+            self.log("ℹ️ Daily reward already claimed today.", Fore.YELLOW)
+            return
+
+        # Ambil snapshot game data (cache dari login jika masih segar)
+        message = await self.get_gamedata(ctx)
+        if message is None:
             return
 
         # Ambil data daily rewards
         try:
-            message = gamedata.get("message", {})
             dailyRewardsData = message.get("dailyRewardsData", {})
             dailyRewardSchema = message.get("dailyRewardSchema", [])
 
@@ -439,16 +2564,22 @@ class wagmihub:
             is_claimed = dailyRewardsData.get("isClaimed", None)
             is_show_daily_reward = dailyRewardsData.get("isShowDailyReward", "N/A")
 
-            self.log("🌞 Daily Rewards Data:", Fore.GREEN)
-            self.log(f"    - Current Day: {current_day}", Fore.CYAN)
-            self.log(f"    - Is Claimed: {is_claimed}", Fore.CYAN)
-            self.log(f"    - Is Show Daily Reward: {is_show_daily_reward}", Fore.CYAN)
+            self.log("🌞 Daily Rewards Data:", Fore.GREEN, level=DEBUG)
+            self.log(f"    - Current Day: {current_day}", Fore.CYAN, level=DEBUG)
+            self.log(f"    - Is Claimed: {is_claimed}", Fore.CYAN, level=DEBUG)
+            self.log(
+                f"    - Is Show Daily Reward: {is_show_daily_reward}",
+                Fore.CYAN,
+                level=DEBUG,
+            )
 
-            self.log("🌞 Daily Reward Schema:", Fore.GREEN)
+            self.log("🌞 Daily Reward Schema:", Fore.GREEN, level=DEBUG)
             for reward in dailyRewardSchema:
                 day = reward.get("day", "N/A")
                 reward_amount = reward.get("reward", "N/A")
-                self.log(f"    - Day {day}: Reward {reward_amount}", Fore.CYAN)
+                self.log(
+                    f"    - Day {day}: Reward {reward_amount}", Fore.CYAN, level=DEBUG
+                )
 
             # Jika daily reward belum diklaim, maka klaim
             if is_claimed is False:
@@ -458,12 +2589,12 @@ class wagmihub:
                 )
                 claim_daily_url = f"{self.BASE_URL}mining/claim/daily"
                 try:
-                    claim_daily_response = requests.post(
-                        claim_daily_url, headers=headers
+                    claim_daily_response = await self.request(
+                        "POST", claim_daily_url, ctx
                     )
                     claim_daily_response.raise_for_status()
                     claim_daily_data = self.decode_response(claim_daily_response)
-                except requests.exceptions.RequestException as e:
+                except aiohttp.ClientError as e:
                     self.log(f"❌ Failed to claim daily reward: {e}", Fore.RED)
                     try:
                         self.log(
@@ -486,6 +2617,11 @@ class wagmihub:
                         pass
                     return
 
+                # Response claim daily tidak membawa saldo baru
+                ctx.invalidate_gamedata()
+                ctx.daily_claimed = True
+                ctx.daily_checked_at = time.time()
+
                 try:
                     claim_message = claim_daily_data.get("message", {})
                     day_claimed = claim_message.get("day", "N/A")
@@ -500,178 +2636,418 @@ class wagmihub:
         except Exception as e:
             self.log(f"❌ Error processing daily rewards data: {e}", Fore.RED)
 
-    def task(self) -> None:
+    async def complete_task(
+        self, ctx: AccountContext, task: dict, limit: asyncio.Semaphore
+    ) -> bool:
+        """
+        Claims and completes a single task.
+
+        Args:
+            ctx (AccountContext): The account the task belongs to.
+            task (dict): The task entry from gametask/all.
+            limit (asyncio.Semaphore): Caps how many completions run at once.
+
+        Returns:
+            bool: True if the server reported the task as completed.
+        """
+        uuid = task.get("uuid")
+        title = task.get("title", "N/A")
+
+        # Claim dan complete task dengan GET ke gametask/complete/{uuid}
+        complete_url = f"{self.BASE_URL}gametask/complete/{uuid}"
+        async with limit:
+            try:
+                self.log(f"📡 Completing task '{title}'...", Fore.CYAN)
+                complete_response = await self.request("GET", complete_url, ctx)
+                complete_response.raise_for_status()
+                complete_data = self.decode_response(complete_response)
+                completed_task = complete_data.get("message", {})
+                if completed_task.get("isCompleted"):
+                    # Reward task mengubah saldo, snapshot sudah basi
+                    ctx.invalidate_gamedata()
+                    ctx.completed_tasks.add(uuid)
+                    self.state.task_done(ctx.key, uuid)
+                    self.log(f"✅ Task '{title}' completed.", Fore.GREEN)
+                    return True
+                self.log(
+                    f"⚠️ Task '{title}' did not complete as expected.",
+                    Fore.YELLOW,
+                )
+            except aiohttp.ClientError as e:
+                self.log(f"❌ Failed to complete task '{title}': {e}", Fore.RED)
+            except Exception as e:
+                self.log(
+                    f"❌ Unexpected error while completing task '{title}': {e}",
+                    Fore.RED,
+                )
+        return False
+
+    async def task(self, ctx: AccountContext) -> dict:
         self.log("🔔 Starting task process...", Fore.GREEN)
-        # Siapkan headers dengan tambahan authorization
-        headers = {**self.HEADERS, "authorization": f"Bearer {self.token}"}
+        result = {"completed": 0, "failed": 0, "skipped": 0}
+
+        # Daftar task tidak perlu diambil ulang setiap siklus
+        now = time.time()
+        interval = self.config.get("task_check_interval", 3600)
+        if ctx.tasks_checked_at and now - ctx.tasks_checked_at < interval:
+            self.log(
+                f"ℹ️ Tasks were checked {int(now - ctx.tasks_checked_at)} seconds ago, skipping.",
+                Fore.YELLOW,
+            )
+            return result
 
         # Request ke API: gametask/all (GET)
         gametask_all_url = f"{self.BASE_URL}gametask/all"
         try:
             self.log("📡 Fetching game tasks...", Fore.CYAN)
-            gametask_all_response = requests.get(gametask_all_url, headers=headers)
+            gametask_all_response = await self.request(
+                "GET", gametask_all_url, ctx, conditional=True
+            )
             gametask_all_response.raise_for_status()
             gametask_all_data = self.decode_response(gametask_all_response)
-        except requests.exceptions.RequestException as e:
+        except aiohttp.ClientError as e:
             self.log(f"❌ Failed to fetch game tasks: {e}", Fore.RED)
-            return
+            return result
         except Exception as e:
             self.log(f"❌ Unexpected error in game tasks request: {e}", Fore.RED)
-            return
+            return result
 
         try:
+            if gametask_all_response.cached:
+                self.log("🗃️ Task list unchanged (304), using cached copy.", Fore.CYAN)
             tasks = gametask_all_data.get("message", [])
             if not tasks:
                 self.log("ℹ️ No tasks available.", Fore.YELLOW)
-            else:
-                self.log("🎮 Available tasks:", Fore.GREEN)
-                for task in tasks:
-                    # Proses hanya task yang belum selesai dan masih aktif
-                    if (
-                        task.get("isCompleted") is False
-                        and task.get("isActive") is True
-                    ):
-                        uuid = task.get("uuid")
-                        title = task.get("title", "N/A")
-                        self.log(f"    - Task: {title} (UUID: {uuid})", Fore.CYAN)
-
-                        # Claim dan complete task dengan GET ke gametask/complete/{uuid}
-                        complete_url = f"{self.BASE_URL}gametask/complete/{uuid}"
-                        try:
-                            self.log(f"📡 Completing task '{title}'...", Fore.CYAN)
-                            complete_response = requests.get(
-                                complete_url, headers=headers
-                            )
-                            complete_response.raise_for_status()
-                            complete_data = self.decode_response(complete_response)
-                            completed_task = complete_data.get("message", {})
-                            if completed_task.get("isCompleted"):
-                                self.log(f"✅ Task '{title}' completed.", Fore.GREEN)
-                            else:
-                                self.log(
-                                    f"⚠️ Task '{title}' did not complete as expected.",
-                                    Fore.YELLOW,
-                                )
-                        except requests.exceptions.RequestException as e:
-                            self.log(
-                                f"❌ Failed to complete task '{title}': {e}", Fore.RED
-                            )
-                        except Exception as e:
-                            self.log(
-                                f"❌ Unexpected error while completing task '{title}': {e}",
-                                Fore.RED,
-                            )
-                    else:
-                        self.log(
-                            f"ℹ️ Skipping task '{task.get('title', 'N/A')}' (completed or inactive).",
-                            Fore.YELLOW,
-                        )
+                ctx.tasks_checked_at = now
+                return result
+
+            self.log("🎮 Available tasks:", Fore.GREEN)
+            pending = []
+            for task in tasks:
+                # Proses hanya task yang belum selesai dan masih aktif
+                if task.get("uuid") in ctx.completed_tasks:
+                    result["skipped"] += 1
+                elif task.get("isCompleted") is False and task.get("isActive") is True:
+                    uuid = task.get("uuid")
+                    title = task.get("title", "N/A")
+                    self.log(f"    - Task: {title} (UUID: {uuid})", Fore.CYAN)
+                    pending.append(task)
+                else:
+                    result["skipped"] += 1
+                    self.log(
+                        f"ℹ️ Skipping task '{task.get('title', 'N/A')}' (completed or inactive).",
+                        Fore.YELLOW,
+                    )
+
+            # Selesaikan task secara paralel, dibatasi oleh task_concurrency
+            limit = asyncio.Semaphore(max(1, self.config.get("task_concurrency", 5)))
+            outcomes = await asyncio.gather(
+                *(self.complete_task(ctx, task, limit) for task in pending)
+            )
+            result["completed"] = sum(1 for ok in outcomes if ok)
+            result["failed"] = len(outcomes) - result["completed"]
+            # Task yang gagal dicoba lagi pada pengecekan berikutnya
+            ctx.tasks_checked_at = now
+            if pending:
+                self.log(
+                    f"📋 Tasks done: {result['completed']} completed, "
+                    f"{result['failed']} failed, {result['skipped']} skipped.",
+                    Fore.GREEN,
+                )
         except Exception as e:
             self.log(f"❌ Error processing game tasks data: {e}", Fore.RED)
+        return result
 
-    def game(self) -> None:
-        self.log("🎲 Starting game process...", Fore.GREEN)
-        headers = {**self.HEADERS, "authorization": f"Bearer {self.token}"}
-        bet_amount = 30000
-        prediction = random.choice(["RIGHT", "LEFT"])
+    async def place_bet(
+        self, ctx: AccountContext, prediction: str, bet_amount: int, time_length: int
+    ):
+        """
+        Places a binary bet for the account.
 
-        # Fungsi untuk memasang taruhan dan mengecek statusnya
-        def place_and_check_bet():
-            place_bet_url = f"{self.BASE_URL}binary/place-bet"
-            payload = json.dumps(
-                {
-                    "binaryTokenId": "12",
-                    "amount": str(bet_amount),
-                    "prediction": prediction,
-                    "timeLength": 15,
-                }
+        Returns:
+            dict: The place-bet message (with the bet "id"), or None if the
+            bet could not be placed.
+        """
+        place_bet_url = f"{self.BASE_URL}binary/place-bet"
+        payload = json.dumps(
+            {
+                "binaryTokenId": "12",
+                "amount": str(bet_amount),
+                "prediction": prediction,
+                "timeLength": time_length,
+            }
+        )
+        try:
+            self.log(f"📡 Placing bet with prediction {prediction}...", Fore.CYAN)
+            place_response = await self.request(
+                "POST", place_bet_url, ctx, data=payload
             )
-            try:
-                self.log(f"📡 Placing bet with prediction {prediction}...", Fore.CYAN)
-                place_response = requests.post(
-                    place_bet_url, headers=headers, data=payload
-                )
-                place_response.raise_for_status()
-                place_data = self.decode_response(place_response)
-            except requests.exceptions.RequestException as e:
-                self.log(f"❌ Failed to place bet: {e}", Fore.RED)
-                return None
-            except Exception as e:
-                self.log(f"❌ Unexpected error placing bet: {e}", Fore.RED)
-                return None
+            place_response.raise_for_status()
+            place_data = self.decode_response(place_response)
+        except aiohttp.ClientError as e:
+            self.log(f"❌ Failed to place bet: {e}", Fore.RED)
+            return None
+        except Exception as e:
+            self.log(f"❌ Unexpected error placing bet: {e}", Fore.RED)
+            return None
+
+        message = place_data.get("message", {})
+        ctx.merge_gamedata(message)
+        bet_id = message.get("id") if isinstance(message, dict) else None
+        if not bet_id:
+            self.log("❌ Bet ID not found in response.", Fore.RED)
+            return None
+
+        self.log(
+            f"✅ Bet placed successfully with id {bet_id}. Result in {time_length} seconds...",
+            Fore.GREEN,
+        )
+        return message
 
-            bet_id = place_data.get("message", {}).get("id")
-            if not bet_id:
-                self.log("❌ Bet ID not found in response.", Fore.RED)
-                return None
+    async def check_bet(
+        self, ctx: AccountContext, bet_id, wait: float, ledger: BetLedger = None
+    ) -> str:
+        """
+        Waits for the bet to run its timeLength, then fetches its status.
+        Balance or tickets in the response are applied to ledger.
 
-            self.log(
-                f"✅ Bet placed successfully with id {bet_id}. Waiting 15 seconds...",
-                Fore.GREEN,
-            )
-            time.sleep(15)
+        Returns:
+            str: The bet status, or None if it could not be checked.
+        """
+        await asyncio.sleep(wait)
 
-            check_bet_url = f"{self.BASE_URL}binary/check-bet/{bet_id}"
-            try:
-                self.log(f"📡 Checking bet status for id {bet_id}...", Fore.CYAN)
-                check_response = requests.get(check_bet_url, headers=headers)
-                check_response.raise_for_status()
-                check_data = self.decode_response(check_response)
-            except requests.exceptions.RequestException as e:
-                self.log(f"❌ Failed to check bet {bet_id}: {e}", Fore.RED)
-                return None
-            except Exception as e:
-                self.log(f"❌ Unexpected error checking bet {bet_id}: {e}", Fore.RED)
-                return None
+        check_bet_url = f"{self.BASE_URL}binary/check-bet/{bet_id}"
+        try:
+            self.log(f"📡 Checking bet status for id {bet_id}...", Fore.CYAN)
+            check_response = await self.request("GET", check_bet_url, ctx)
+            check_response.raise_for_status()
+            check_data = self.decode_response(check_response)
+        except aiohttp.ClientError as e:
+            self.log(f"❌ Failed to check bet {bet_id}: {e}", Fore.RED)
+            return None
+        except Exception as e:
+            self.log(f"❌ Unexpected error checking bet {bet_id}: {e}", Fore.RED)
+            return None
 
-            bet_status = (
-                check_data.get("message", {}).get("bet", {}).get("status", "N/A")
-            )
-            self.log(f"🎲 Bet {bet_id} status: {bet_status}", Fore.GREEN)
-            return bet_id
+        ctx.merge_gamedata(check_data.get("message", {}))
+        if ledger is not None and isinstance(check_data.get("message"), dict):
+            ledger.settle(check_data["message"])
+        bet_status = check_data.get("message", {}).get("bet", {}).get("status", "N/A")
+        self.log(f"🎲 Bet {bet_id} status: {bet_status}", Fore.GREEN)
+        return bet_status
 
-        # Main loop: terus periksa data game hingga tiket atau saldo tidak mencukupi
-        while True:
-            # Request game data
-            gamedata_url = f"{self.BASE_URL}game/mining/gamedata"
-            try:
-                self.log("📡 Fetching game data...", Fore.CYAN)
-                gamedata_response = requests.get(gamedata_url, headers=headers)
-                gamedata_response.raise_for_status()
-                gamedata = self.decode_response(gamedata_response)
-            except requests.exceptions.RequestException as e:
-                self.log(f"❌ Failed to fetch game data: {e}", Fore.RED)
-                break
-            except Exception as e:
-                self.log(f"❌ Unexpected error fetching game data: {e}", Fore.RED)
-                break
+    async def game(self, ctx: AccountContext) -> None:
+        """
+        Places bets while the account has tickets and balance.
 
-            message = gamedata.get("message", {})
-            ticket_count = message.get("ticketCount", 0)
-            balance_str = message["userData"].get("balance", "0")
-            try:
-                balance = int(balance_str)
-            except Exception:
-                balance = 0
+        The budget, min(tickets, balance // bet_amount), comes from one game
+        data snapshot and is tracked in a BetLedger, so there is no game
+        data fetch or pause between bets. The ledger is reconciled with a
+        fresh snapshot after a failed or mismatching bet, and once at the
+        end unless the server confirmed the ticket count of every bet.
+        """
+        self.log("🎲 Starting game process...", Fore.GREEN)
+        bet_amount = self.BET_AMOUNT
+        time_length = 15
+        prediction = random.choice(["RIGHT", "LEFT"])
+        max_pending = max(1, self.config.get("max_pending_bets", 3))
 
-            self.log(f"🎟 Ticket Count: {ticket_count}", Fore.CYAN)
-            self.log(f"💰 Balance: {balance}", Fore.CYAN)
+        # Ambil snapshot game data (cache atau request baru) sekali saja
+        message = await self.get_gamedata(ctx)
+        if message is None:
+            return
+        ledger = BetLedger(bet_amount)
+        ledger.reconcile(message)
+        self.log(f"🎟 Ticket Count: {ledger.tickets}", Fore.CYAN)
+        self.log(f"💰 Balance: {ledger.balance}", Fore.CYAN)
 
-            # Validasi: pastikan tiket tersedia dan saldo mencukupi
-            if ticket_count <= 0:
+        failed = 0
+        while True:
+            # Validasi dari ledger dulu: tanpa tiket/saldo tidak perlu menunggu slot
+            if ledger.tickets <= 0:
                 self.log("ℹ️ No tickets available, ending game process.", Fore.YELLOW)
                 break
-            if balance < bet_amount:
+            if ledger.budget <= 0:
                 self.log("ℹ️ Insufficient balance to place a bet.", Fore.YELLOW)
                 break
 
-            # Lakukan taruhan satu per satu
-            self.log("🚀 Placing a single bet...", Fore.GREEN)
-            place_and_check_bet()
+            # Batasi jumlah taruhan yang masih menunggu hasil; hasil yang masuk
+            # bisa mengubah ledger, jadi validasi diulang setelah menunggu
+            if len(ctx.pending_bets) >= max_pending:
+                await asyncio.wait(
+                    ctx.pending_bets, return_when=asyncio.FIRST_COMPLETED
+                )
+                continue
+
+            # Pasang taruhan; hasilnya dicek di background setelah timeLength
+            self.log(
+                f"🚀 Placing a single bet ({ledger.budget} left in budget)...",
+                Fore.GREEN,
+            )
+            placed = await self.place_bet(ctx, prediction, bet_amount, time_length)
+            if placed is not None:
+                failed = 0
+                check = asyncio.create_task(
+                    self.check_bet(ctx, placed["id"], time_length, ledger)
+                )
+                ctx.pending_bets.add(check)
+                check.add_done_callback(ctx.pending_bets.discard)
+                self.bet_checks.add(check)
+                check.add_done_callback(self.bet_check_done)
+                if ledger.spend(placed):
+                    continue
+                self.log("⚠️ Bet ledger does not match the server.", Fore.YELLOW)
+            else:
+                failed += 1
+                if failed > 1:
+                    break
+
+            # Taruhan gagal atau angka server berbeda: cocokkan ulang ledger
+            message = await self.get_gamedata(ctx, force=True)
+            if message is None:
+                break
+            ledger.reconcile(message)
+            self.log(
+                f"🔁 Ledger reconciled: {ledger.tickets} tickets, balance {ledger.balance}.",
+                Fore.CYAN,
+            )
+
+        ctx.ticket_count = ledger.tickets
+        ctx.balance = ledger.balance
+        if ledger.unconfirmed:
+            # Server tidak melaporkan ticketCount: satu fetch di akhir untuk scheduler
+            message = await self.get_gamedata(ctx, force=True)
+            if message is not None and ledger.reconcile(message):
+                self.log(
+                    f"🔁 Ledger reconciled: {ledger.tickets} tickets, balance {ledger.balance}.",
+                    Fore.CYAN,
+                )
+        if ledger.placed:
+            self.log(f"🎲 Placed {ledger.placed} bets this cycle.", Fore.GREEN)
+
+        if ctx.pending_bets:
+            self.log(
+                f"⏳ {len(ctx.pending_bets)} bets still running, results will be logged when they settle.",
+                Fore.CYAN,
+            )
+
+    def bet_check_done(self, check: asyncio.Task) -> None:
+        """
+        Forgets a finished bet check and sets finished once the last one
+        settles after all accounts are done.
+        """
+        self.bet_checks.discard(check)
+        if self.finishing and not self.bet_checks:
+            self.finished.set()
+
+    def finish(self) -> None:
+        """
+        Stops the run once every account is done, waiting for the bet checks
+        still running so their requests are part of the run.
+        """
+        self.finishing = True
+        if self.bet_checks:
+            self.log(
+                f"⏳ Waiting for {len(self.bet_checks)} bet results before stopping...",
+                Fore.CYAN,
+            )
+            return
+        self.finished.set()
+
+    async def settle_bets(self, timeout: float) -> None:
+        """
+        Waits up to timeout seconds for running bet checks, then cancels the
+        rest. Called before the session pool closes, so no check is left
+        without a session.
+        """
+        if not self.bet_checks:
+            return
+        self.log(
+            f"⏳ Waiting for {len(self.bet_checks)} bet results before stopping...",
+            Fore.CYAN,
+        )
+        checks = set(self.bet_checks)
+        _, left = await asyncio.wait(checks, timeout=timeout)
+        for check in left:
+            check.cancel()
+        if left:
+            await asyncio.gather(*left, return_exceptions=True)
+            self.log(f"⚠️ {len(left)} bet results were not checked.", Fore.YELLOW)
+
+    def next_run(self, ctx: AccountContext) -> float:
+        """
+        Computes when the account next has something to claim.
+
+        Candidates are the mining crackTime, the next daily reset (00:00 UTC)
+        once today's reward is claimed, and right away while the account still
+        has tickets and balance for a bet. When none is known (e.g. login
+        failed) the account is retried after "delay_loop" seconds, or when
+        its quarantine ends if the login was rejected.
+        "min_account_interval" keeps an account from being picked up again
+        immediately.
+
+        A phase that is still due right after the cycle ran it made no
+        progress (a rejected bet, a failing claim). Its deadline is pushed
+        back by "min_account_interval", doubling on every further stalled
+        cycle up to "delay_loop", so a broken account is not retried every
+        minute forever.
 
-            # Setelah taruhan, tunggu beberapa saat dan periksa ulang data game
-            self.log("🔄 Rechecking game data after bet...", Fore.CYAN)
-            time.sleep(3)
+        Args:
+            ctx (AccountContext): The account that was just processed.
+
+        Returns:
+            float: Unix timestamp of the next run.
+        """
+        if ctx.quarantined:
+            return ctx.quarantined_until
+        now = time.time()
+        deadlines = self.deadlines(ctx, now) if ctx.token is not None else {}
+        interval = self.config.get("min_account_interval", 60)
+        delay_loop = self.config.get("delay_loop", 30)
+        for phase in list(ctx.stalls):
+            if deadlines.get(phase, now + 1) > now:
+                ctx.stalls.pop(phase)
+        for phase, deadline in deadlines.items():
+            if deadline > now:
+                continue
+            stalls = ctx.stalls[phase] = ctx.stalls.get(phase, 0) + 1
+            delay = min(interval * 2 ** (stalls - 1), max(delay_loop, interval))
+            deadlines[phase] = now + delay
+            self.log(
+                f"⏸️ {phase} made no progress ({stalls}x), retrying in {delay:.0f}s.",
+                Fore.YELLOW,
+            )
+        next_time = min(deadlines.values()) if deadlines else now + delay_loop
+        return max(next_time, now + interval)
+
+    def deadlines(self, ctx: AccountContext, now: float) -> dict:
+        """Times at which the enabled phases next have work, by phase name."""
+        deadlines = {}
+        if self.config.get("farming", False) and ctx.crack_time is not None:
+            deadlines["farming"] = ctx.crack_time
+        if self.config.get("daily", False) and ctx.daily_claimed is not None:
+            if ctx.daily_done():
+                tomorrow = datetime.now(timezone.utc).date() + timedelta(days=1)
+                reset = datetime(
+                    tomorrow.year, tomorrow.month, tomorrow.day, tzinfo=timezone.utc
+                )
+                deadlines["daily"] = reset.timestamp()
+            else:
+                deadlines["daily"] = now
+        if (
+            self.config.get("game", False)
+            and ctx.ticket_count > 0
+            and ctx.balance >= self.BET_AMOUNT
+        ):
+            deadlines["game"] = now
+        if self.config.get("task", False):
+            checked = ctx.tasks_checked_at
+            deadlines["task"] = (
+                checked + self.config.get("task_check_interval", 3600)
+                if checked
+                else now
+            )
+        return deadlines
 
     def load_proxies(self, filename="proxy.txt"):
         """
@@ -693,90 +3069,95 @@ class wagmihub:
             self.log(f"❌ Failed to load proxies: {e}", Fore.RED)
             return []
 
-    def set_proxy_session(self, proxies: list) -> requests.Session:
+    async def probe_proxy(self, proxy: str) -> bool:
         """
-        Creates a requests session with a working proxy from the given list.
-
-        If a chosen proxy fails the connectivity test, it will try another proxy
-        until a working one is found. If no proxies work or the list is empty, it
-        will return a session with a direct connection.
+        Sends one request through the proxy to "proxy_test_url".
 
         Args:
-            proxies (list): A list of proxy addresses (e.g., "http://proxy_address:port").
+            proxy (str): The proxy URL to test.
 
         Returns:
-            requests.Session: A session object configured with a working proxy,
-                            or a direct connection if none are available.
+            bool: True if the proxy answered with a successful status.
         """
-        # If no proxies are provided, use a direct connection.
-        if not proxies:
-            self.log("⚠️ No proxies available. Using direct connection.", Fore.YELLOW)
-            self.proxy_session = requests.Session()
-            return self.proxy_session
+        test_url = self.config.get("proxy_test_url", "https://httpbin.org/ip")
+        try:
+            response = await self.request(
+                "GET",
+                test_url,
+                headers={},
+                proxy=proxy,
+                timeout=self.config.get("proxy_timeout", 5),
+                retries=0,
+            )
+            response.raise_for_status()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self.log(f"❌ Proxy failed: {proxy} | Error: {e}", Fore.RED, level=DEBUG)
+            return False
+
+        try:
+            origin_ip = json_loads(response.content).get("origin", "Unknown IP")
+        except (AttributeError, ValueError):
+            origin_ip = "Unknown IP"
+        self.log(
+            f"✅ Proxy OK: {proxy} | Your IP: {origin_ip}", Fore.GREEN, level=DEBUG
+        )
+        return True
+
+    async def check_proxies(self) -> None:
+        """Probes the whole proxy pool concurrently and logs the result."""
+        healthy = await self.proxies.check_all(self.probe_proxy)
+        color = Fore.GREEN if healthy else Fore.YELLOW
+        self.log(
+            f"🛡️ Proxy check: {healthy}/{len(self.proxies)} proxies available.", color
+        )
+        if not healthy:
+            self.log("⚠️ No working proxies. Using direct connection.", Fore.YELLOW)
 
-        # Copy the list so that we can modify it without affecting the original.
-        available_proxies = proxies.copy()
+    async def monitor_proxies(self) -> None:
+        """Re-probes the proxy pool every "proxy_check_interval" seconds."""
+        interval = self.config.get("proxy_check_interval", 600)
+        while True:
+            await asyncio.sleep(interval)
+            await self.check_proxies()
 
-        while available_proxies:
-            proxy_url = random.choice(available_proxies)
-            self.proxy_session = requests.Session()
-            self.proxy_session.proxies = {"http": proxy_url, "https": proxy_url}
 
-            try:
-                test_url = "https://httpbin.org/ip"
-                response = self.proxy_session.get(test_url, timeout=5)
-                response.raise_for_status()
-                origin_ip = response.json().get("origin", "Unknown IP")
-                self.log(
-                    f"✅ Using Proxy: {proxy_url} | Your IP: {origin_ip}", Fore.GREEN
-                )
-                return self.proxy_session
-            except requests.RequestException as e:
-                self.log(f"❌ Proxy failed: {proxy_url} | Error: {e}", Fore.RED)
-                # Remove the failed proxy and try again.
-                available_proxies.remove(proxy_url)
-
-        # If none of the proxies worked, use a direct connection.
-        self.log("⚠️ All proxies failed. Using direct connection.", Fore.YELLOW)
-        self.proxy_session = requests.Session()
-        return self.proxy_session
-
-    def override_requests(self):
-        import random
-
-        """Override requests functions globally when proxy is enabled."""
-        if self.config.get("proxy", False):
-            self.log("[CONFIG] 🛡️ Proxy: ✅ Enabled", Fore.YELLOW)
-            proxies = self.load_proxies()
-            self.set_proxy_session(proxies)
-
-            # Override request methods
-            requests.get = self.proxy_session.get
-            requests.post = self.proxy_session.post
-            requests.put = self.proxy_session.put
-            requests.delete = self.proxy_session.delete
-        else:
-            self.log("[CONFIG] proxy: ❌ Disabled", Fore.RED)
-            # Restore original functions if proxy is disabled
-            requests.get = self._original_requests["get"]
-            requests.post = self._original_requests["post"]
-            requests.put = self._original_requests["put"]
-            requests.delete = self._original_requests["delete"]
+async def export_metrics(wagmi, config):
+    """Writes the metrics file every "metrics_interval" seconds."""
+    path = config.get("metrics_file")
+    interval = config.get("metrics_interval", 15)
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            wagmi.metrics.write(wagmi.shard_path(path))
+        except OSError as e:
+            wagmi.log(f"❌ Failed to write metrics file {path}: {e}", Fore.RED)
+
 
+async def process_account(ctx, wagmi, config):
+    # Tandai semua log dari task ini dengan label akun
+    current_account.set(ctx.label)
 
-async def process_account(account, original_index, account_label, wagmi, config):
     # Menampilkan informasi akun
-    display_account = account[:10] + "..." if len(account) > 10 else account
-    wagmi.log(f"👤 Processing {account_label}: {display_account}", Fore.YELLOW)
+    wagmi.log(f"👤 Processing {ctx.key}", Fore.YELLOW)
 
-    # Override proxy jika diaktifkan
+    # Ambil proxy (sticky per akun) dari pool jika diaktifkan; biasanya sudah
+    # dipilih oleh wagmi.pace() saat akun dijadwalkan
     if config.get("proxy", False):
-        wagmi.override_requests()
+        ctx.proxy = wagmi.proxies.assign(ctx.key) if wagmi.proxies else None
+        wagmi.log(
+            f"[CONFIG] 🛡️ Proxy: ✅ Enabled | {ctx.proxy or 'direct connection'}",
+            Fore.YELLOW,
+        )
     else:
         wagmi.log("[CONFIG] Proxy: ❌ Disabled", Fore.RED)
 
-    # Login (fungsi blocking, dijalankan di thread terpisah) dengan menggunakan index asli (integer)
-    await asyncio.to_thread(wagmi.login, original_index)
+    # Login (async, berjalan langsung di event loop)
+    with wagmi.metrics.phase("login"):
+        logged_in = await wagmi.login(ctx)
+    if not logged_in:
+        # Tanpa token semua fase pasti gagal; lepas worker secepatnya
+        wagmi.log(f"⏭️ Login failed, skipping {ctx.label}.", Fore.YELLOW)
+        return
 
     wagmi.log("🛠️ Starting task execution...", Fore.CYAN)
     tasks_config = {
@@ -795,76 +3176,570 @@ async def process_account(account, original_index, account_label, wagmi, config)
         )
         if task_status:
             wagmi.log(f"🔄 Executing {task_name}...", Fore.CYAN)
-            await asyncio.to_thread(getattr(wagmi, task_key))
+            with wagmi.metrics.phase(task_key):
+                await getattr(wagmi, task_key)(ctx)
+            if ctx.quarantined:
+                # Login ulang setelah 401 ditolak
+                wagmi.log(f"⏭️ Skipping remaining phases of {ctx.label}.", Fore.YELLOW)
+                return
 
-    delay_switch = config.get("delay_account_switch", 10)
-    wagmi.log(
-        f"➡️ Finished processing {account_label}. Waiting {Fore.WHITE}{delay_switch}{Fore.CYAN} seconds before next account.",
-        Fore.CYAN,
-    )
-    await asyncio.sleep(delay_switch)
+    # Jeda antar akun diatur scheduler (wagmi.pace), worker langsung lanjut
+    wagmi.log(f"➡️ Finished processing {ctx.label}.", Fore.CYAN)
 
 
-async def worker(worker_id, wagmi, config, queue):
+async def worker(worker_id, wagmi, config, scheduler):
     """
-    Setiap worker akan mengambil satu akun dari antrian dan memprosesnya secara berurutan.
+    Setiap worker mengambil akun yang deadline-nya sudah lewat dari scheduler,
+    memprosesnya, lalu menjadwalkan ulang akun tersebut sesuai deadline berikutnya.
     Worker tidak akan mengambil akun baru sebelum akun sebelumnya selesai diproses.
     """
     while True:
+        # Satu slot per akun; jumlah slot diatur ConcurrencyController
+        async with wagmi.concurrency:
+            ctx = await scheduler.next_due()
+            if ctx.key not in wagmi.accounts:
+                # Akun sudah dihapus dari query.txt
+                wagmi.contexts.pop(ctx.key, None)
+                wagmi.responses.forget(ctx.key)
+                wagmi.log(
+                    f"🗑️ Account-{ctx.index+1} ({ctx.key}) was removed from query.txt.",
+                    Fore.YELLOW,
+                )
+                continue
+            ctx.label = f"Worker-{worker_id} Account-{ctx.index+1}"
+            if wagmi.shard_count > 1:
+                ctx.label = f"{wagmi.shard_label} {ctx.label}"
+            wagmi.in_progress += 1
+            wagmi.concurrency.busy(wagmi.in_progress)
+            start = time.monotonic()
+            # Batas waktu satu putaran akun; lewat batas dibatalkan dan dijadwalkan ulang
+            budget = config.get("account_timeout", 300) or None
+            try:
+                await asyncio.wait_for(process_account(ctx, wagmi, config), budget)
+            except asyncio.TimeoutError:
+                wagmi.metrics.inc("wagmi_account_timeouts_total")
+                wagmi.log(
+                    f"⌛ {ctx.label} took longer than {budget} seconds, cancelled.",
+                    Fore.RED,
+                )
+            except Exception as e:
+                # Worker tetap hidup; akun dijadwalkan ulang seperti biasa
+                wagmi.metrics.inc("wagmi_account_errors_total")
+                wagmi.log(
+                    f"❌ Unexpected error processing {ctx.label}: {type(e).__name__}: {e}",
+                    Fore.RED,
+                )
+            finally:
+                wagmi.in_progress -= 1
+                wagmi.concurrency.busy(wagmi.in_progress)
+                wagmi.metrics.observe(
+                    "wagmi_account_cycle_duration_seconds", time.monotonic() - start
+                )
+                wagmi.metrics.inc("wagmi_accounts_processed_total")
+                wagmi.state.save(ctx)
+                ctx.cycles += 1
+                max_cycles = config.get("max_cycles", 0)
+                if max_cycles and ctx.cycles >= max_cycles:
+                    # Akun selesai; berhenti jika tidak ada akun lain yang tersisa
+                    next_time = None
+                    if not len(scheduler) and wagmi.in_progress == 0:
+                        wagmi.log(
+                            f"🏁 All accounts finished {max_cycles} cycles, stopping.",
+                            Fore.GREEN,
+                        )
+                        wagmi.finish()
+                else:
+                    next_time = wagmi.next_run(ctx)
+                    scheduler.schedule(ctx, next_time)
+            if next_time is not None:
+                wagmi.log(
+                    f"⏰ Account-{ctx.index+1} scheduled again in {Fore.WHITE}{int(next_time - time.time())}{Fore.CYAN} seconds.",
+                    Fore.CYAN,
+                )
+
+
+async def tune_concurrency(wagmi, config):
+    """Runs the concurrency controller and logs every change of the limit."""
+    controller = wagmi.concurrency
+    interval = config.get("concurrency", {}).get("interval", 10)
+    while True:
+        await asyncio.sleep(interval)
+        previous = await controller.adjust()
+        if previous is not None and previous != controller.limit:
+            arrow = "📈" if controller.limit > previous else "📉"
+            wagmi.log(
+                f"{arrow} Concurrency limit {previous} → {controller.limit} "
+                f"(p95 {controller.p95:.2f}s, errors {controller.error_rate:.1%}).",
+                Fore.CYAN,
+            )
+
+
+async def flush_state(wagmi, config):
+    """Writes buffered account state to the state database in batches."""
+    import sqlite3
+
+    interval = config.get("state_flush_interval", 10)
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            wagmi.state.flush()
+        except sqlite3.Error as e:
+            wagmi.log(f"❌ Failed to write account state: {e}", Fore.RED)
+
+
+async def watch_accounts(wagmi, scheduler, config):
+    """
+    Picks up accounts added to or removed from query.txt while running.
+
+    New accounts are scheduled right away; removed ones are dropped by the
+    worker when their turn comes. Quarantined accounts whose line changed
+    (e.g. fresh initData) are released and retried right away.
+    """
+    interval = config.get("query_reload_interval", 60)
+    version = wagmi.accounts.version
+    while True:
+        await asyncio.sleep(interval)
         try:
-            original_index, account = queue.get_nowait()
-        except asyncio.QueueEmpty:
-            break
-        account_label = f"Worker-{worker_id} Account-{original_index+1}"
-        await process_account(account, original_index, account_label, wagmi, config)
-        queue.task_done()
-    wagmi.log(
-        f"Worker-{worker_id} finished processing all assigned accounts.", Fore.CYAN
-    )
+            wagmi.accounts.refresh()
+        except OSError as e:
+            wagmi.log(f"❌ Failed to reload query.txt: {e}", Fore.RED)
+            continue
+        # Rescan bisa juga dipicu query() saat login; perubahannya tetap terkumpul
+        if wagmi.accounts.version == version:
+            continue
+        version = wagmi.accounts.version
+        added, removed = wagmi.accounts.take_changes()
+        added = [key for key in added if wagmi.in_shard(key)]
+        removed = [key for key in removed if wagmi.in_shard(key)]
+        now = time.time()
+        # initData akun yang dikarantina diganti: coba login lagi sekarang
+        for ctx in list(wagmi.contexts.values()):
+            if ctx.quarantined and ctx.quarantine_checksum != wagmi.accounts.checksum(
+                ctx.key
+            ):
+                wagmi.release(ctx)
+                if scheduler.reschedule(ctx, now):
+                    wagmi.log(
+                        f"🔓 Account-{ctx.index+1} ({ctx.key}) changed in query.txt, released from quarantine.",
+                        Fore.YELLOW,
+                    )
+        if not added and not removed:
+            continue
+        for key in added:
+            wagmi.add_account(scheduler, key, now)
+        wagmi.log(
+            f"📂 query.txt changed: {len(added)} accounts added, {len(removed)} removed.",
+            Fore.YELLOW,
+        )
+
+
+async def report_progress(wagmi, scheduler, progress, interval):
+    """
+    Sends this shard's counters to the supervisor every interval seconds,
+    and stops the shard if the supervisor is gone.
+    """
+    import multiprocessing
+
+    parent = multiprocessing.parent_process()
+    while True:
+        if parent is not None and not parent.is_alive():
+            wagmi.log("🛑 Supervisor is gone, stopping shard.", Fore.RED)
+            wagmi.finished.set()
+            return
+        progress.put(shard_progress(wagmi, scheduler))
+        await asyncio.sleep(interval)
+
+
+def shard_progress(wagmi, scheduler) -> dict:
+    return {
+        "shard": wagmi.shard_index,
+        "processed": wagmi.metrics.value("wagmi_accounts_processed_total"),
+        "waiting": len(scheduler),
+        "due": scheduler.due_count(),
+        "in_progress": wagmi.in_progress,
+        "time": time.time(),
+    }
 
 
-async def main():
-    wagmi = wagmihub()  # Inisialisasi instance class wagmihub Anda
-    config = wagmi.load_config()
-    all_accounts = wagmi.query_list
-    num_threads = config.get("thread", 1)  # Jumlah worker sesuai konfigurasi
+async def main(shard_index=0, shard_count=1, progress=None, cassette=None, config=None):
+    # Inisialisasi instance class wagmihub Anda
+    wagmi = wagmihub(shard_index, shard_count, cassette, config)
+    config = wagmi.config
+    if cassette is not None and cassette.replaying:
+        wagmi.log(
+            f"📼 Replaying {cassette.load()} recorded responses from {cassette.path} "
+            f"(latency x{cassette.latency_scale:g}).",
+            Fore.YELLOW,
+        )
+    if shard_count > 1:
+        current_account.set(wagmi.shard_label)
+    all_accounts = [key for key in wagmi.accounts.keys() if wagmi.in_shard(key)]
+    # Worker sebanyak batas maksimum; yang aktif dibatasi ConcurrencyController
+    num_threads = wagmi.concurrency.maximum
 
     if config.get("proxy", False):
-        proxies = wagmi.load_proxies()
+        wagmi.proxies = ProxyPool(
+            wagmi.load_proxies(),
+            max_failures=config.get("proxy_max_failures", 3),
+            cooldown=config.get("proxy_cooldown", 300),
+        )
 
     wagmi.log(
         "🎉 [LIVEXORDS] === Welcome to Wagmi Hub Automation === [LIVEXORDS]",
         Fore.YELLOW,
     )
-    wagmi.log(f"📂 Loaded {len(all_accounts)} accounts from query list.", Fore.YELLOW)
-
-    while True:
-        # Buat queue baru dan masukkan semua akun (dengan index asli)
-        queue = asyncio.Queue()
-        for idx, account in enumerate(all_accounts):
-            queue.put_nowait((idx, account))
-
-        # Buat task worker sesuai dengan jumlah thread yang diinginkan
-        workers = [
-            asyncio.create_task(worker(i + 1, wagmi, config, queue))
-            for i in range(num_threads)
-        ]
-
-        # Tunggu hingga semua akun di queue telah diproses
-        await queue.join()
-
-        # Opsional: batalkan task worker (agar tidak terjadi tumpang tindih)
-        for w in workers:
-            w.cancel()
-
-        wagmi.log("🔁 All accounts processed. Restarting loop.", Fore.CYAN)
-        delay_loop = config.get("delay_loop", 30)
+    if shard_count > 1:
         wagmi.log(
-            f"⏳ Sleeping for {Fore.WHITE}{delay_loop}{Fore.CYAN} seconds before restarting.",
-            Fore.CYAN,
+            f"📂 {len(all_accounts)} of {len(wagmi.accounts)} accounts belong to {wagmi.shard_label}.",
+            Fore.YELLOW,
+        )
+    else:
+        wagmi.log(
+            f"📂 Loaded {len(all_accounts)} accounts from query list.", Fore.YELLOW
+        )
+
+    # Akun baru langsung jatuh tempo; akun dengan state tersimpan melanjutkan
+    # dari deadline terakhirnya. Jeda antar akun per proxy diatur wagmi.pace
+    scheduler = Scheduler(pace=wagmi.pace)
+    metrics = wagmi.metrics
+    workers, background, metrics_runner = [], [], None
+    wagmi.logger.start()
+    # Startup juga di dalam try: jika gagal (mis. metrics_port dipakai),
+    # state.db tetap ditutup dan log tetap ditulis
+    try:
+        now = time.time()
+        for key in all_accounts:
+            wagmi.add_account(scheduler, key, now)
+        STARTUP.mark("scheduler")
+        if config.get("max_cycles") and not all_accounts:
+            wagmi.finished.set()
+
+        async with wagmi.sessions() as pool:
+            wagmi.pool = pool
+            try:
+                # Gauge dibaca saat metrics di-render
+                metrics.gauge(
+                    "wagmi_scheduler_accounts",
+                    "Accounts waiting in the scheduler.",
+                    scheduler.__len__,
+                )
+                metrics.gauge(
+                    "wagmi_scheduler_due_accounts",
+                    "Accounts whose deadline has passed but no worker has picked them up.",
+                    scheduler.due_count,
+                )
+                metrics.gauge(
+                    "wagmi_accounts_in_progress",
+                    "Accounts being processed right now.",
+                    lambda: wagmi.in_progress,
+                )
+                metrics.gauge(
+                    "wagmi_concurrency_limit",
+                    "Accounts allowed to be processed at the same time.",
+                    lambda: wagmi.concurrency.limit,
+                )
+                metrics.gauge(
+                    "wagmi_quarantined_accounts",
+                    "Accounts waiting out a rejected login.",
+                    wagmi.quarantined_count,
+                )
+                metrics.gauge(
+                    "wagmi_connection_reuse_ratio",
+                    "Share of requests sent on a reused connection.",
+                    pool.reuse_ratio,
+                )
+
+                background.append(asyncio.create_task(flush_state(wagmi, config)))
+                if not wagmi.concurrency.fixed:
+                    background.append(
+                        asyncio.create_task(tune_concurrency(wagmi, config))
+                    )
+                if config.get("query_reload_interval", 60):
+                    background.append(
+                        asyncio.create_task(watch_accounts(wagmi, scheduler, config))
+                    )
+                if progress is not None:
+                    background.append(
+                        asyncio.create_task(
+                            report_progress(
+                                wagmi,
+                                scheduler,
+                                progress,
+                                config.get("shard_report_interval", 10),
+                            )
+                        )
+                    )
+                if config.get("metrics_file"):
+                    background.append(
+                        asyncio.create_task(export_metrics(wagmi, config))
+                    )
+                if config.get("metrics_port"):
+                    # Satu port per shard: metrics_port, metrics_port + 1, ...
+                    host = config.get("metrics_host", "127.0.0.1")
+                    port = config["metrics_port"] + (
+                        shard_index if shard_count > 1 else 0
+                    )
+                    metrics_runner = await metrics.serve(host, port)
+                    wagmi.log(
+                        f"📈 Metrics available at http://{host}:{port}/metrics",
+                        Fore.GREEN,
+                    )
+
+                # Cek semua proxy sekali di awal, lalu ulangi di background
+                if wagmi.proxies is not None:
+                    await wagmi.check_proxies()
+                    background.append(asyncio.create_task(wagmi.monitor_proxies()))
+
+                # Buat task worker sesuai dengan jumlah thread yang diinginkan
+                workers.extend(
+                    asyncio.create_task(worker(i + 1, wagmi, config, scheduler))
+                    for i in range(num_threads)
+                )
+
+                status_interval = config.get("status_interval", 300)
+                while True:
+                    try:
+                        await asyncio.wait_for(wagmi.finished.wait(), status_interval)
+                        break
+                    except asyncio.TimeoutError:
+                        pass
+                    next_deadline = scheduler.next_deadline()
+                    wait = (
+                        max(0, int(next_deadline - time.time())) if next_deadline else 0
+                    )
+                    wagmi.log(
+                        f"📊 {len(scheduler)} accounts waiting, next due in {Fore.WHITE}{wait}{Fore.CYAN} seconds, "
+                        f"{wagmi.in_progress}/{wagmi.concurrency.limit} running.",
+                        Fore.CYAN,
+                    )
+                    wagmi.log(
+                        f"🔌 Connection reuse: {pool.reuse_ratio():.1%} "
+                        f"({pool.reused} reused / {pool.created} opened)",
+                        Fore.CYAN,
+                    )
+                    quarantined = wagmi.quarantined_count()
+                    if quarantined:
+                        wagmi.log(
+                            f"🚫 {quarantined} accounts in quarantine after a rejected login.",
+                            Fore.YELLOW,
+                        )
+                    if wagmi.responses.hits or wagmi.responses.misses:
+                        wagmi.log(
+                            f"🗃️ Response cache: {len(wagmi.responses)} entries, "
+                            f"{wagmi.responses.hits} hits (304) / {wagmi.responses.misses} misses",
+                            Fore.CYAN,
+                        )
+                    wagmi.tokens.save()
+            finally:
+                for w in workers + background:
+                    w.cancel()
+                # Hasil taruhan dicek sebelum pool session ditutup
+                await wagmi.settle_bets(config.get("shutdown_timeout", 30))
+    finally:
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
+        if config.get("metrics_file"):
+            metrics.write(wagmi.shard_path(config["metrics_file"]))
+        if progress is not None:
+            progress.put(shard_progress(wagmi, scheduler))
+        wagmi.tokens.save()
+        wagmi.state.close()
+        if cassette is not None and not cassette.replaying:
+            wagmi.log(
+                f"📼 Recorded {cassette.save()} responses to {cassette.path}.",
+                Fore.YELLOW,
+            )
+        await wagmi.logger.stop()
+
+
+def run_shard(shard_index, shard_count, progress, config, profile_startup=False):
+    """Entry point of a shard process started by supervise()."""
+    STARTUP.enabled = profile_startup
+    try:
+        asyncio.run(main(shard_index, shard_count, progress, config=config))
+    except KeyboardInterrupt:
+        pass
+
+
+def supervise(processes, shard_index=0, shard_count=1, profile_startup=False):
+    """
+    Runs this host's accounts in several processes.
+
+    The host's part of the account list (shard_index of shard_count) is split
+    again into "processes" shards, so shard k of this host is global shard
+    shard_index * processes + k of shard_count * processes. Every account
+    always hashes to the same shard and keeps its token cache. Crashed
+    shards are restarted with exponential backoff; a shard that exits
+    cleanly (max_cycles reached) is left alone. Progress reported by the
+    shards is summarised every "status_interval" seconds. config.json is
+    read once here and handed to every shard.
+    """
+    import multiprocessing
+    import queue
+
+    logger = AsyncLogger()
+    try:
+        with open("config.json", "r") as config_file:
+            config = json.load(config_file)
+    except (OSError, json.JSONDecodeError):
+        # Shard membaca sendiri dan melaporkan errornya
+        config = None
+    settings = config or {}
+    logger.set_level(settings.get("log_level", "info"))
+    status_interval = settings.get("status_interval", 300)
+    restart_delay = settings.get("shard_restart_delay", 5)
+
+    total = shard_count * processes
+    shard_ids = [shard_index * processes + k for k in range(processes)]
+    progress = multiprocessing.Queue()
+    running = {}
+    started = {}
+    restarts = dict.fromkeys(shard_ids, 0)
+    restart_at = {}
+    finished = set()
+    latest = {}
+
+    def start(shard):
+        process = multiprocessing.Process(
+            target=run_shard,
+            args=(shard, total, progress, config, profile_startup),
+            name=f"wagmi-shard-{shard + 1}",
+        )
+        process.start()
+        running[shard] = process
+        started[shard] = time.time()
+        logger.log(
+            f"🚀 Started shard {shard + 1}/{total} (pid {process.pid}).", Fore.GREEN
         )
-        await asyncio.sleep(delay_loop)
+
+    logger.log(
+        f"🧩 Supervising {processes} shards ({shard_ids[0] + 1}-{shard_ids[-1] + 1} of {total}).",
+        Fore.CYAN,
+    )
+    for shard in shard_ids:
+        start(shard)
+
+    next_status = time.time() + status_interval
+    try:
+        while len(finished) < len(shard_ids):
+            try:
+                report = progress.get(timeout=1)
+                while True:
+                    latest[report["shard"]] = report
+                    report = progress.get_nowait()
+            except queue.Empty:
+                pass
+
+            now = time.time()
+            for shard in shard_ids:
+                process = running.get(shard)
+                if process is not None and not process.is_alive():
+                    process.join()
+                    del running[shard]
+                    if process.exitcode == 0:
+                        finished.add(shard)
+                        logger.log(
+                            f"🏁 Shard {shard + 1}/{total} finished.", Fore.GREEN
+                        )
+                        continue
+                    # Backoff di-reset jika shard sempat berjalan cukup lama
+                    if now - started[shard] > 300:
+                        restarts[shard] = 0
+                    delay = min(300, restart_delay * 2 ** restarts[shard])
+                    restarts[shard] += 1
+                    restart_at[shard] = now + delay
+                    logger.log(
+                        f"💥 Shard {shard + 1}/{total} exited with code {process.exitcode}, restarting in {delay} seconds.",
+                        Fore.RED,
+                    )
+                if shard in restart_at and now >= restart_at[shard]:
+                    del restart_at[shard]
+                    start(shard)
+
+            if now >= next_status:
+                next_status = now + status_interval
+                logger.log(
+                    f"📊 {len(running)}/{len(shard_ids)} shards running, "
+                    f"{sum(r['processed'] for r in latest.values()):.0f} accounts processed, "
+                    f"{sum(r['in_progress'] for r in latest.values())} in progress, "
+                    f"{sum(r['due'] for r in latest.values())} overdue.",
+                    Fore.CYAN,
+                )
+                for shard, report in sorted(latest.items()):
+                    logger.log(
+                        f"   Shard {shard + 1}: {report['processed']:.0f} processed, "
+                        f"{report['waiting']} waiting, {report['in_progress']} in progress, "
+                        f"last report {int(now - report['time'])}s ago, "
+                        f"{restarts[shard]} restarts.",
+                        Fore.CYAN,
+                    )
+    except KeyboardInterrupt:
+        # Ctrl+C juga sampai ke shard; beri waktu untuk menyimpan token
+        logger.log("🛑 Stopping shards...", Fore.YELLOW)
+        for process in running.values():
+            process.join(timeout=10)
+    finally:
+        for process in running.values():
+            if process.is_alive():
+                process.terminate()
+                process.join()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Wagmi Hub Bot")
+    parser.add_argument(
+        "--shards",
+        type=int,
+        default=1,
+        help="number of worker processes to split the accounts across",
+    )
+    parser.add_argument(
+        "--shard-index",
+        type=int,
+        default=0,
+        help="this host's shard (0-based) when running on several hosts",
+    )
+    parser.add_argument(
+        "--shard-count", type=int, default=1, help="number of hosts/shards in total"
+    )
+    cassette = parser.add_mutually_exclusive_group()
+    cassette.add_argument(
+        "--record", metavar="PATH", help="record every API response to a cassette"
+    )
+    cassette.add_argument(
+        "--replay", metavar="PATH", help="answer API calls from a recorded cassette"
+    )
+    parser.add_argument(
+        "--profile-startup",
+        action="store_true",
+        help="log how long imports and init took until the first API call",
+    )
+    parser.add_argument(
+        "--replay-latency",
+        type=float,
+        default=1.0,
+        metavar="SCALE",
+        help="multiply recorded latency when replaying (0 = no delay)",
+    )
+    args = parser.parse_args()
+    if args.shards < 1 or args.shard_count < 1:
+        parser.error("--shards and --shard-count must be at least 1")
+    if not 0 <= args.shard_index < args.shard_count:
+        parser.error("--shard-index must be between 0 and --shard-count - 1")
+    if (args.record or args.replay) and args.shards > 1:
+        parser.error("--record and --replay run in a single process (--shards 1)")
+    return args
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    args = parse_args()
+    STARTUP.enabled = args.profile_startup
+    if args.shards > 1:
+        supervise(args.shards, args.shard_index, args.shard_count, args.profile_startup)
+    else:
+        cassette = None
+        if args.record:
+            cassette = Cassette("record", args.record)
+        elif args.replay:
+            cassette = Cassette("replay", args.replay, args.replay_latency)
+        asyncio.run(main(args.shard_index, args.shard_count, cassette=cassette))
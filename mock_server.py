@@ -0,0 +1,269 @@
+"""
+Local mock of the cyberfin API used by the Wagmi Hub bot.
+
+Usage:
+    python mock_server.py [--port 8765] [--latency MS] [--jitter MS]
+                          [--error-rate P] [--error-status 503]
+                          [--tasks N] [--tickets N] [--dead-rate P]
+
+Implements every endpoint the bot calls under /api/v1/ with in-memory state
+per access token, so a run behaves like a real account: mining is claimable
+once, the daily reward flips to claimed, tasks complete and bets use up
+tickets and balance. Point the bot at it with "base_url" in config.json:
+
+    "base_url": "http://127.0.0.1:8765/api/v1/"
+
+--latency/--jitter delay every API response, --error-rate answers that
+share of API calls with --error-status instead. --dead-rate rejects that
+share of accounts (picked by a hash of their initData) at game/initdata
+with 401, like expired initData. gametask/all sends ETag
+and Last-Modified and answers If-None-Match/If-Modified-Since with 304.
+GET /stats returns the number of calls per endpoint (reset with
+DELETE /stats).
+"""
+
+import argparse
+import asyncio
+import hashlib
+import itertools
+import json
+import random
+import time
+from email.utils import formatdate
+
+from aiohttp import web
+
+BET_AMOUNT = 30000
+
+
+class MockState:
+    """Accounts, call counters and fault injection settings of the mock."""
+
+    def __init__(self, args):
+        self.latency = args.latency / 1000
+        self.jitter = args.jitter / 1000
+        self.error_rate = args.error_rate
+        self.error_status = args.error_status
+        self.tasks = args.tasks
+        self.tickets = args.tickets
+        self.dead_rate = args.dead_rate
+        self.accounts = {}
+        self.calls = {}
+        self.bet_ids = itertools.count(1)
+
+    def account(self, request: web.Request) -> dict:
+        token = request.headers.get("authorization", "")
+        account = self.accounts.get(token)
+        if account is None:
+            seed = hashlib.sha256(token.encode("utf-8")).hexdigest()
+            account = self.accounts[token] = {
+                "crack_time": int(time.time()) - 60,
+                "balance": BET_AMOUNT * self.tickets,
+                "tickets": self.tickets,
+                "daily_claimed": False,
+                "tasks": {
+                    f"{seed[:8]}-0000-4000-8000-{i:012d}": False
+                    for i in range(self.tasks)
+                },
+                # Detik terakhir daftar task berubah (untuk Last-Modified)
+                "tasks_modified": int(time.time()),
+            }
+        return account
+
+    def gamedata(self, account: dict) -> dict:
+        return {
+            "miningData": {
+                "lastClaimTime": account["crack_time"] - 3600,
+                "miningRate": 12.5,
+                "crackTime": account["crack_time"],
+            },
+            "userData": {"balance": str(account["balance"])},
+            "squadData": {"title": "MOCK"},
+            "ticketCount": account["tickets"],
+            "dailyRewardsData": {
+                "currentDay": 1,
+                "isClaimed": account["daily_claimed"],
+            },
+            "dailyRewardSchema": [{"day": 1, "reward": 1000}],
+        }
+
+
+def reply(message, status: int = 200) -> web.Response:
+    return web.json_response({"message": message}, status=status)
+
+
+@web.middleware
+async def simulate(request: web.Request, handler):
+    """Counts the call, then applies latency and error injection."""
+    state = request.app["state"]
+    if not request.path.startswith("/api/"):
+        return await handler(request)
+
+    route = request.match_info.route.resource
+    name = route.canonical if route is not None else request.path
+    state.calls[name] = state.calls.get(name, 0) + 1
+
+    delay = state.latency + random.uniform(0, state.jitter)
+    if delay > 0:
+        await asyncio.sleep(delay)
+    if state.error_rate and random.random() < state.error_rate:
+        return reply("Injected error", status=state.error_status)
+    if (
+        request.path != "/api/v1/game/initdata"
+        and "authorization" not in request.headers
+    ):
+        return reply("Unauthorized", status=401)
+    return await handler(request)
+
+
+async def initdata(request: web.Request) -> web.Response:
+    body = await request.json()
+    digest = hashlib.sha256(body.get("initData", "").encode("utf-8")).hexdigest()
+    if int(digest[:8], 16) / 0x100000000 < request.app["state"].dead_rate:
+        return reply("Invalid init data", status=401)
+    return reply({"accessToken": f"mock-{digest[:32]}"})
+
+
+async def gamedata(request: web.Request) -> web.Response:
+    state = request.app["state"]
+    return reply(state.gamedata(state.account(request)))
+
+
+async def claim(request: web.Request) -> web.Response:
+    state = request.app["state"]
+    account = state.account(request)
+    if account["crack_time"] > time.time():
+        return reply("Mining is not finished yet", status=400)
+    account["crack_time"] = int(time.time()) + 4 * 3600
+    account["balance"] += 5000
+    message = state.gamedata(account)
+    return reply({"miningData": message["miningData"], "userData": message["userData"]})
+
+
+async def claim_daily(request: web.Request) -> web.Response:
+    account = request.app["state"].account(request)
+    account["daily_claimed"] = True
+    account["balance"] += 1000
+    return reply({"day": 1, "reward": 1000})
+
+
+async def tasks(request: web.Request) -> web.Response:
+    """Task list with ETag/Last-Modified; answers revalidation with 304."""
+    account = request.app["state"].account(request)
+    etag = '"{}"'.format(
+        hashlib.sha256(
+            json.dumps(account["tasks"], sort_keys=True).encode("utf-8")
+        ).hexdigest()[:16]
+    )
+    modified = account["tasks_modified"]
+    validators = {"ETag": etag, "Last-Modified": formatdate(modified, usegmt=True)}
+
+    if_none_match = request.headers.get("If-None-Match")
+    if_modified_since = request.if_modified_since
+    if if_none_match is not None:
+        not_modified = etag in [tag.strip() for tag in if_none_match.split(",")]
+    else:
+        not_modified = (
+            if_modified_since is not None and modified <= if_modified_since.timestamp()
+        )
+    if not_modified:
+        return web.Response(status=304, headers=validators)
+
+    response = reply(
+        [
+            {
+                "uuid": uuid,
+                "title": f"Mock task {i}",
+                "reward": 25000,
+                "isActive": True,
+                "isCompleted": done,
+            }
+            for i, (uuid, done) in enumerate(account["tasks"].items())
+        ]
+    )
+    response.headers.update(validators)
+    return response
+
+
+async def complete_task(request: web.Request) -> web.Response:
+    account = request.app["state"].account(request)
+    uuid = request.match_info["uuid"]
+    if uuid not in account["tasks"]:
+        return reply("Task not found", status=404)
+    account["tasks"][uuid] = True
+    account["tasks_modified"] = int(time.time())
+    return reply({"isCompleted": True})
+
+
+async def place_bet(request: web.Request) -> web.Response:
+    state = request.app["state"]
+    account = state.account(request)
+    body = await request.json()
+    amount = int(body.get("amount", BET_AMOUNT))
+    if account["tickets"] <= 0 or account["balance"] < amount:
+        return reply("Not enough tickets or balance", status=400)
+    account["tickets"] -= 1
+    account["balance"] -= amount
+    return reply({"id": next(state.bet_ids), "ticketCount": account["tickets"]})
+
+
+async def check_bet(request: web.Request) -> web.Response:
+    return reply({"bet": {"status": random.choice(["WIN", "LOSE"])}})
+
+
+async def stats(request: web.Request) -> web.Response:
+    return web.json_response(request.app["state"].calls)
+
+
+async def reset_stats(request: web.Request) -> web.Response:
+    request.app["state"].calls.clear()
+    return web.json_response({})
+
+
+def build_app(args) -> web.Application:
+    app = web.Application(middlewares=[simulate])
+    app["state"] = MockState(args)
+    app.add_routes(
+        [
+            web.post("/api/v1/game/initdata", initdata),
+            web.get("/api/v1/game/mining/gamedata", gamedata),
+            web.get("/api/v1/mining/claim", claim),
+            web.post("/api/v1/mining/claim/daily", claim_daily),
+            web.get("/api/v1/gametask/all", tasks),
+            web.get("/api/v1/gametask/complete/{uuid}", complete_task),
+            web.post("/api/v1/binary/place-bet", place_bet),
+            web.get("/api/v1/binary/check-bet/{id}", check_bet),
+            web.get("/stats", stats),
+            web.delete("/stats", reset_stats),
+        ]
+    )
+    return app
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Mock cyberfin API server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument(
+        "--latency", type=float, default=0, help="base response delay (ms)"
+    )
+    parser.add_argument(
+        "--jitter", type=float, default=0, help="random extra delay, up to (ms)"
+    )
+    parser.add_argument(
+        "--error-rate", type=float, default=0, help="share of API calls that fail"
+    )
+    parser.add_argument(
+        "--error-status", type=int, default=503, help="status of injected errors"
+    )
+    parser.add_argument("--tasks", type=int, default=10, help="tasks per account")
+    parser.add_argument("--tickets", type=int, default=3, help="tickets per account")
+    parser.add_argument(
+        "--dead-rate", type=float, default=0, help="share of accounts rejected at login"
+    )
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    web.run_app(build_app(args), host=args.host, port=args.port, print=None)